@@ -3,13 +3,16 @@ from agent.templates import get_template_reply
 from agent.llm_gate import should_use_llm
 from agent.strategies import choose_strategy
 from agent.persona import build_prompt
-from agent.extraction import extract_intelligence
-from agent.extraction import dedup_preserve_order
+from agent.extraction import dedup_intel
 from agent.termination import should_terminate
 from agent.reflection import reflect
+from agent.analysis import analyze_message, phrase_hits, FINANCIAL_LURE_PHRASES, INSTANT_SCAM_PHRASES, URGENCY_WORDS
+from agent.retrieval import find_reply, remember_reply
+from agent.load_control import load_controller
 import google.generativeai as genai
-from agent.json_utils import safe_parse_json
+from agent.json_utils import decode_llm_reply, ReplyFieldExtractor, REPLY_SCHEMA
 import os, copy
+from contextlib import closing
 from dotenv import load_dotenv
 import time
 
@@ -17,13 +20,70 @@ LLM_WINDOW = []
 LLM_MAX_CALLS = 50   # per 60 seconds
 LLM_WINDOW_SECONDS = 60
 
+# Ask Gemini for schema-constrained JSON instead of free text
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") != "0"
+GENERATION_CONFIG = (
+    {"response_mime_type": "application/json", "response_schema": REPLY_SCHEMA}
+    if LLM_STRUCTURED_OUTPUT else None
+)
+
 
 load_dotenv()
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel("models/gemini-2.5-flash")
 
-def agent_step(session: dict, incoming_text: str) -> dict:
+def agent_step(session: dict, incoming_text: str, llm_permit=None) -> dict:
+    """
+    Run one turn. `llm_permit`, if given, is called right before a Gemini
+    call and can veto it (e.g. caller quotas); the turn then uses templates.
+    """
+    steps = agent_step_stream(session, incoming_text, llm_permit=llm_permit, stream_llm=False)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def agent_step_stream(session: dict, incoming_text: str, llm_permit=None, stream_llm=True):
+    """
+    agent_step as a generator that yields the reply while it is produced:
+    {"delta": text} pieces as Gemini streams, or the whole reply as one
+    delta. A template fallback after Gemini already streamed part of a
+    reply carries "replace": True. Returns agent_step's result.
+    """
+    turn = prepare_turn(session, incoming_text)
+    streamed = False
+
+    # Tier 1: a past LLM reply to a similar message, if close enough
+    reply_text = retrieved_reply(session, turn)
+
+    # Tier 2: Gemini
+    if not reply_text and turn["allow_llm"] and (llm_permit is None or llm_permit()):
+        if stream_llm:
+            try:
+                for delta in stream_llm_reply(session, turn):
+                    streamed = True
+                    yield {"delta": delta}
+                reply_text = turn["llm_reply"]
+            except Exception:
+                reply_text = None
+        else:
+            reply_text = llm_reply(session, turn)
+
+    # Tier 3: static templates
+    if not reply_text:
+        reply_text = template_reply(session, turn)
+        yield {"delta": reply_text, "replace": streamed}
+    elif not streamed:
+        yield {"delta": reply_text}
+
+    return finish_turn(session, turn, reply_text)
+
+
+def prepare_turn(session: dict, incoming_text: str) -> dict:
+    """Everything before reply generation: state, intel, scam status, strategy, gating."""
     agent_state = session.setdefault("agent_state", {})
     intelligence = session.setdefault("intelligence", {})
     messages = session.setdefault("messages", [])
@@ -38,7 +98,11 @@ def agent_step(session: dict, incoming_text: str) -> dict:
     agent_state.setdefault("used_templates", [])
     agent_state.setdefault("last_language", "english")
     agent_state.setdefault("llm_calls", 0)
-    language = agent_state["last_language"]  # often "english"
+
+    # One pass over the message for every stage below. Language is
+    # detected locally, so template turns follow the scammer's language too
+    analysis = analyze_message(incoming_text, default_language=agent_state["last_language"])
+    language = analysis.language
 
     # Append incoming message
     messages.append({"sender": "scammer", "text": incoming_text})
@@ -50,21 +114,19 @@ def agent_step(session: dict, incoming_text: str) -> dict:
     # -----------------------------
     # INTELLIGENCE EXTRACTION
     # -----------------------------
-    intel_delta = extract_intelligence(incoming_text)
-
-    for k, v in intel_delta.items():
+    for k, v in analysis.intel.items():
         intelligence.setdefault(k, []).extend(v)
-        intelligence[k] = dedup_preserve_order(intelligence[k])
+        intelligence[k] = dedup_intel(k, intelligence[k])
 
     # -----------------------------
     # UPDATE SCAM STATUS
     # -----------------------------
-    update_scam_status(session, incoming_text)
+    update_scam_status(session, incoming_text, analysis=analysis)
 
     # -----------------------------
     # DECIDE STRATEGY
     # -----------------------------
-    strategy = choose_strategy(session, incoming_text)
+    strategy = choose_strategy(session, incoming_text, analysis=analysis)
 
     # -----------------------------
     # LLM RATE + GATING DECISION
@@ -81,51 +143,110 @@ def agent_step(session: dict, incoming_text: str) -> dict:
         and should_use_llm(strategy, agent_state, session)
     )
 
-    # -----------------------------
-    # RESPONSE GENERATION
-    # -----------------------------
-    reply_text = None
-    language = agent_state["last_language"]
+    return {
+        "incoming_text": incoming_text,
+        "analysis": analysis,
+        "language": language,
+        "strategy": strategy,
+        "allow_llm": allow_llm,
+        "prev_intel": prev_intel,
+        "prev_strategy": prev_strategy,
+    }
 
-    if allow_llm:
-        try:
-            prompt = build_prompt(messages, strategy, incoming_text)
-            resp = model.generate_content(prompt)
-            raw = (resp.text or "").strip()
 
-            if not raw:
-                raise ValueError("Empty Gemini response")
+# -----------------------------
+# RESPONSE GENERATION
+# -----------------------------
 
-            parsed = safe_parse_json(raw)
+def retrieved_reply(session: dict, turn: dict):
+    messages = session["messages"]
+    used_replies = {m["text"] for m in messages if m["sender"] == "agent"}
+    reply = find_reply(turn["strategy"], turn["language"], turn["incoming_text"], exclude=used_replies)
+    if reply:
+        turn["reply_source"] = "retrieval"
+    return reply
 
-            if parsed and "reply" in parsed:
-                reply_text = parsed["reply"]
-                language = parsed.get("language", language)
-            else:
-                reply_text = raw
 
-            agent_state["llm_calls"] += 1
-            llm_window.append(time.time())
+def _accept_llm_output(session: dict, turn: dict, raw: str):
+    agent_state = session["agent_state"]
+    agent_state["llm_calls"] += 1
+    agent_state["llm_window"].append(time.time())
 
-        except Exception:
-            reply_text = None
+    # Undecodable output falls through to templates
+    decoded = decode_llm_reply(raw)
+    if not decoded:
+        return None
 
-    if not reply_text:
-        reply_text = get_template_reply(
-            strategy,
-            language,
-            agent_state["used_templates"]
-        )
-        agent_state["used_templates"].append(reply_text)
+    turn["language"] = decoded["language"] or turn["language"]
+    turn["reply_source"] = "llm"
+    remember_reply(turn["strategy"], turn["language"], turn["incoming_text"], decoded["reply"])
+    return decoded["reply"]
+
+
+def llm_reply(session: dict, turn: dict):
+    try:
+        prompt = build_prompt(session["messages"], turn["strategy"], turn["incoming_text"], turn["language"])
+        with load_controller.llm_call():
+            resp = model.generate_content(prompt, generation_config=GENERATION_CONFIG)
+            raw = resp.text
+
+        return _accept_llm_output(session, turn, raw)
+
+    except Exception:
+        return None
+
+
+def stream_llm_reply(session: dict, turn: dict):
+    """
+    Like llm_reply, but yields pieces of the reply text while Gemini
+    generates it. The decoded reply (or None) ends up in turn["llm_reply"].
+    Errors propagate to agent_step_stream.
+    """
+    turn["llm_reply"] = None
+    prompt = build_prompt(session["messages"], turn["strategy"], turn["incoming_text"], turn["language"])
+    extractor = ReplyFieldExtractor()
+    chunks = []
+
+    stream = load_controller.llm_stream(
+        lambda: model.generate_content(prompt, generation_config=GENERATION_CONFIG, stream=True)
+    )
+    with closing(stream):
+        for chunk in stream:
+            text = chunk.text
+            chunks.append(text)
+            delta = extractor.feed(text)
+            if delta:
+                yield delta
+
+    turn["llm_reply"] = _accept_llm_output(session, turn, "".join(chunks))
+
+
+def template_reply(session: dict, turn: dict) -> str:
+    agent_state = session["agent_state"]
+    reply_text = get_template_reply(
+        turn["strategy"],
+        turn["language"],
+        agent_state["used_templates"]
+    )
+    agent_state["used_templates"].append(reply_text)
+    turn["reply_source"] = "template"
+    return reply_text
+
+
+def finish_turn(session: dict, turn: dict, reply_text: str) -> dict:
+    """Everything after reply generation: history, reflection, next strategy, termination."""
+    agent_state = session["agent_state"]
+    intelligence = session["intelligence"]
+    messages = session["messages"]
 
-    agent_state["last_language"] = language
+    agent_state["last_language"] = turn["language"]
 
     messages.append({"sender": "agent", "text": reply_text})
 
     # -----------------------------
     # REFLECTION
     # -----------------------------
-    reflection = reflect(prev_intel, intelligence, prev_strategy)
+    reflection = reflect(turn["prev_intel"], intelligence, turn["prev_strategy"])
 
     if reflection == "stall":
         agent_state["stall_count"] += 1
@@ -135,8 +256,9 @@ def agent_step(session: dict, incoming_text: str) -> dict:
     # Update state
     agent_state["current_strategy"] = choose_strategy(
         session,
-        incoming_text,
-        reflection=reflection
+        turn["incoming_text"],
+        reflection=reflection,
+        analysis=turn["analysis"]
     )
     agent_state["turns"] += 1
 
@@ -151,7 +273,9 @@ def agent_step(session: dict, incoming_text: str) -> dict:
     return {
         "reply": reply_text,
         "should_finalize": finalize,
-        "agent_notes": generate_agent_notes(session)
+        # Only the final callback reports notes
+        "agent_notes": generate_agent_notes(session) if finalize else None,
+        "reply_source": turn.get("reply_source", "template"),
     }
 
 
@@ -186,7 +310,7 @@ def generate_agent_notes(session: dict) -> str:
 
     return "Scammer used " + " and ".join(notes)
 
-def update_scam_status(session, incoming_text):
+def update_scam_status(session, incoming_text, analysis=None):
     # Ensure initialization
     session.setdefault("scam_detected", False)
     session.setdefault("scam_confidence", 0)
@@ -196,7 +320,7 @@ def update_scam_status(session, incoming_text):
         return
 
     intelligence = session.get("intelligence", {})
-    text = incoming_text.lower()
+    hits = analysis.hits if analysis is not None else phrase_hits(incoming_text.lower())
 
     # Track which signals already counted
     flags = session.setdefault("scam_flags", {
@@ -212,13 +336,12 @@ def update_scam_status(session, incoming_text):
 
     # ----------------------------
     # HARD INSTANT DETECTION PATH
-    financial_lure_words = ["investment", "guaranteed return", "profit daily", "double money"]
-    if any(w in text for w in financial_lure_words) and not flags.get("financial_lure", False):
+    if any(p in hits for p in FINANCIAL_LURE_PHRASES) and not flags.get("financial_lure", False):
         new_score += 2
         flags["financial_lure"] = True
 
     # ----------------------------
-    if any(w in text for w in ["send otp", "share otp", "transfer immediately"]):
+    if any(p in hits for p in INSTANT_SCAM_PHRASES):
         session["scam_detected"] = True
         session["scam_confidence"] = 10
         return
@@ -253,8 +376,7 @@ def update_scam_status(session, incoming_text):
     # ----------------------------
     # Urgency language (count once)
     # ----------------------------
-    urgency_words = ["urgent", "immediately", "blocked", "suspended", "verify"]
-    if any(word in text for word in urgency_words) and not flags["urgency"]:
+    if any(p in hits for p in URGENCY_WORDS) and not flags["urgency"]:
         new_score += 2
         flags["urgency"] = True
 
@@ -284,15 +406,15 @@ def rebuild_state_from_history(session, history):
             continue
 
         text = msg["text"]
+        analysis = analyze_message(text)
 
         # Extract intelligence
-        intel_delta = extract_intelligence(text)
-        for k, v in intel_delta.items():
+        for k, v in analysis.intel.items():
             session["intelligence"].setdefault(k, []).extend(v)
-            session["intelligence"][k] = dedup_preserve_order(session["intelligence"][k])
+            session["intelligence"][k] = dedup_intel(k, session["intelligence"][k])
 
         # Update scam detection
-        update_scam_status(session, text)
+        update_scam_status(session, text, analysis=analysis)
 
         # Increment turn count manually
         session["agent_state"].setdefault("turns", 0)
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+from agent.extraction import SUSPICIOUS_KEYWORDS, extract_intelligence
+from agent.language import detect_language
+
+# Everything the per-turn stages look for in the lowercased message.
+# The union is checked once per message; stages test membership in
+# MessageAnalysis.hits instead of re-scanning the text.
+
+FINANCIAL_LURE_PHRASES = ["investment", "guaranteed return", "profit daily", "double money"]
+INSTANT_SCAM_PHRASES = ["send otp", "share otp", "transfer immediately"]
+URGENCY_WORDS = ["urgent", "immediately", "blocked", "suspended", "verify"]
+OTP_WORD = "otp"
+
+VOCABULARY = tuple(dict.fromkeys(
+    SUSPICIOUS_KEYWORDS + FINANCIAL_LURE_PHRASES + INSTANT_SCAM_PHRASES + URGENCY_WORDS + [OTP_WORD]
+))
+
+
+@dataclass(frozen=True)
+class MessageAnalysis:
+    text: str
+    lower: str
+    language: str
+    hits: frozenset   # VOCABULARY phrases contained in `lower`
+    intel: dict       # extract_intelligence(text)
+
+
+def phrase_hits(lower: str) -> frozenset:
+    """The VOCABULARY phrases contained in an already lowercased message."""
+    return frozenset(p for p in VOCABULARY if p in lower)
+
+
+def analyze_message(text: str, default_language: str = "english") -> MessageAnalysis:
+    """Build the shared analysis of one incoming message; done once per turn."""
+    lower = text.lower()
+    hits = phrase_hits(lower)
+    return MessageAnalysis(
+        text=text,
+        lower=lower,
+        language=detect_language(text, default=default_language),
+        hits=hits,
+        intel=extract_intelligence(text, text_lower=lower, keyword_hits=hits),
+    )
@@ -0,0 +1,173 @@
+from urllib.parse import urlsplit, urlunsplit
+
+# Reversed-label tries over UPI PSP handles, known email providers and
+# public suffixes. Built once at import; a lookup walks the labels of one
+# handle or host from the right, so classifying an entity is a few dict hops.
+
+# Handles issued by UPI apps and banks (the part after "@")
+UPI_HANDLES = [
+    "ybl", "ibl", "axl",                                   # PhonePe
+    "okaxis", "okhdfcbank", "okicici", "oksbi",            # Google Pay
+    "paytm", "ptyes", "ptaxis", "pthdfc", "ptsbi",         # Paytm
+    "apl", "yapl", "rapl",                                 # Amazon Pay
+    "upi", "bhim",                                         # BHIM
+    "axisbank", "axisb", "hdfcbank", "icici", "sbi", "pnb", "kotak",
+    "barodampay", "boi", "cnrb", "idfcbank", "indus", "federal", "fbl",
+    "yesbank", "aubank", "kbl", "rbl", "uco", "unionbank", "centralbank",
+    "mahb", "idbi", "dbs", "hsbc", "sc", "citi", "postbank",
+    "ikwik", "freecharge", "jupiteraxis", "waicici", "waaxis", "wahdfcbank",
+    "wasbi", "naviaxis", "slc", "abfspay", "superyes", "airtel", "jio",
+]
+
+# Mail providers, so their addresses are emails even where
+# PUBLIC_SUFFIXES does not list the TLD
+EMAIL_PROVIDERS = [
+    "gmail.com", "googlemail.com", "yahoo.com", "yahoo.co.in", "ymail.com",
+    "rediffmail.com", "outlook.com", "hotmail.com", "live.com", "msn.com",
+    "icloud.com", "me.com", "protonmail.com", "proton.me", "zoho.com",
+    "zohomail.in", "aol.com", "mail.com", "gmx.com", "gmx.de", "web.de",
+    "mail.ru", "yandex.ru",
+]
+
+# Registry suffixes seen in Indian scam traffic; longest match wins
+PUBLIC_SUFFIXES = [
+    "com", "net", "org", "info", "biz", "co", "io", "me", "in", "us", "uk",
+    "xyz", "top", "site", "online", "live", "app", "link", "club", "shop",
+    "store", "tech", "cc", "ly", "gl", "to", "ws", "tk", "ml", "ga", "cf",
+    "gq", "icu", "vip", "win", "click", "pro", "bank", "money", "finance",
+    "support", "help", "services", "page", "work", "buzz", "cloud", "dev",
+    "co.in", "net.in", "org.in", "gov.in", "nic.in", "ac.in", "edu.in",
+    "firm.in", "gen.in", "ind.in", "res.in", "co.uk", "org.uk", "com.au",
+]
+
+# Query parameters that only track the click
+TRACKING_PARAMS = frozenset(["fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref_src"])
+TRAILING_PUNCTUATION = ".,;:!?)]}>'\""
+BRACKETS = {")": "(", "]": "[", "}": "{", ">": "<"}
+
+PROVIDER = "provider"
+SUFFIX = "suffix"
+
+
+class DomainTrie:
+    """Maps domains to a label; `match` finds the longest known suffix of a host."""
+
+    _END = ""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, domain: str, label: str) -> None:
+        node = self.root
+        for part in reversed(domain.split(".")):
+            node = node.setdefault(part, {})
+        node[self._END] = label
+
+    def match(self, labels: list):
+        """(label, depth) of the longest entry that ends `labels`, or (None, 0)."""
+        node = self.root
+        found, depth = None, 0
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[i])
+            if node is None:
+                break
+            if self._END in node:
+                found, depth = node[self._END], len(labels) - i
+        return found, depth
+
+
+DOMAINS = DomainTrie()
+for _suffix in PUBLIC_SUFFIXES:
+    DOMAINS.add(_suffix, SUFFIX)
+for _provider in EMAIL_PROVIDERS:
+    DOMAINS.add(_provider, PROVIDER)
+
+HANDLES = DomainTrie()
+for _handle in UPI_HANDLES:
+    HANDLES.add(_handle, "psp")
+
+
+def strip_trailing_punctuation(text: str) -> str:
+    """
+    Drop sentence punctuation glued to the end of a hit. A closing
+    bracket stays when the hit opens it too ("https://x.com/(secure)").
+    """
+    while text and text[-1] in TRAILING_PUNCTUATION:
+        opener = BRACKETS.get(text[-1])
+        if opener and text.count(opener) >= text.count(text[-1]):
+            break
+        text = text[:-1]
+    return text
+
+
+def classify_address(address: str):
+    """
+    Label a "local@domain" hit as ("upi" | "email", address as written
+    minus trailing punctuation), or None when it is neither. Use
+    `canonical_address` for dedup.
+
+    Dotless domains are UPI handles. Dotted ones are emails, unless the
+    suffix is not a known registry and the first label is a PSP handle
+    ("pay abc@ybl.Thanks" with the space missing).
+    """
+    local, _, domain = strip_trailing_punctuation(address).rpartition("@")
+    if not local or not domain:
+        return None
+    labels = domain.lower().split(".")
+
+    if len(labels) == 1:
+        if len(local) >= 2 and domain.isalpha() and len(domain) >= 2:
+            return "upi", f"{local}@{domain}"
+        return None
+
+    kind, _ = DOMAINS.match(labels)
+    if kind is None and HANDLES.match(labels[:1])[0] and len(local) >= 2:
+        return "upi", f"{local}@{domain.split('.')[0]}"
+    return "email", f"{local}@{domain}"
+
+
+def canonical_address(address: str) -> str:
+    return address.lower()
+
+
+def normalize_link(url: str) -> str:
+    """
+    Canonical form of a link for dedup and indexing (not for display):
+    lowercase scheme and host, no "www.", default port, fragment,
+    tracking parameters, trailing slash or unbalanced trailing
+    punctuation. Path and the remaining query are kept byte for byte.
+    """
+    url = strip_trailing_punctuation(url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    host = (parts.hostname or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    if port and port != {"http": 80, "https": 443}.get(parts.scheme.lower()):
+        netloc = f"{netloc}:{port}"
+
+    query = parts.query
+    if query and ("utm_" in query or any(p in query for p in TRACKING_PARAMS)):
+        # Drop whole raw segments; decoding and re-encoding would
+        # rewrite the parameters that are kept
+        query = "&".join(
+            segment for segment in query.split("&")
+            if not _is_tracking(segment.partition("=")[0])
+        )
+
+    path = parts.path
+    if path == "/" or (path.endswith("/") and not query):
+        path = path.rstrip("/")
+
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ""))
+
+
+def _is_tracking(name: str) -> bool:
+    return name.startswith("utm_") or name in TRACKING_PARAMS
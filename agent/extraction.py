@@ -1,12 +1,17 @@
 import re
+from typing import NamedTuple
 
+from agent.domains import classify_address, canonical_address, normalize_link, strip_trailing_punctuation
 
-def dedup_preserve_order(items):
+
+def dedup_preserve_order(items, key=None):
+    """First occurrence of each item; `key` maps items to what counts as equal."""
     seen = set()
     result = []
     for item in items:
-        if item not in seen:
-            seen.add(item)
+        marker = key(item) if key else item
+        if marker not in seen:
+            seen.add(marker)
             result.append(item)
     return result
 
@@ -35,12 +40,76 @@ BANK_CONTEXT = [
 ]
 
 
+# Compiled once at import, so a preloading server builds them before fork
+LINK_PATTERN = re.compile(r"https?://[^\s]+")
+# Any local@domain; UPI ID vs email is decided by agent.domains
+ADDRESS_PATTERN = re.compile(r"\b[a-zA-Z0-9._+-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*")
+PHONE_PATTERN = re.compile(r"(?:\+91[\-\s]?)?[6-9]\d{9}")
+NUMERIC_PATTERN = re.compile(r"\b\d{8,18}\b")
+CASE_ID_PATTERNS = [
+    re.compile(r"\b(?:case|ref|reference|ticket|complaint|id)[\s#:]*([a-zA-Z0-9-]{4,})\b", re.IGNORECASE),
+    re.compile(r"\b(?:case|ref|reference)[\s#:]*(\d{4,})\b", re.IGNORECASE),
+]
+POLICY_PATTERN = re.compile(r"\bpolicy[\s#:]*(?:no\.?|number)?[\s#:]*([a-zA-Z0-9-]{3,})\b", re.IGNORECASE)
+ORDER_PATTERN = re.compile(r"\border[\s#:]*(?:id|no\.?|number)?[\s#:]*([a-zA-Z0-9-]{3,})\b", re.IGNORECASE)
+
+
+# Intelligence fields whose values are spelled in many ways; values are
+# stored as written, and these give the key they are deduplicated on
+CANONICAL_KEYS = {
+    "upiIds": canonical_address,
+    "emailAddresses": canonical_address,
+    "phishingLinks": normalize_link,
+}
+
+
+def intel_key(field: str, value: str) -> str:
+    key = CANONICAL_KEYS.get(field)
+    return key(value) if key else value
+
+
+def dedup_intel(field: str, items):
+    return dedup_preserve_order(items, key=CANONICAL_KEYS.get(field))
+
+
+class Entity(NamedTuple):
+    kind: str    # "upi", "email" or "link"
+    value: str   # as written, minus trailing punctuation
+    key: str     # canonical form, for dedup and indexing
+    start: int
+    end: int
+
+
+def extract_entities(text: str) -> list:
+    """UPI IDs, emails and links in `text`, classified and normalized."""
+    entities = []
+    for m in LINK_PATTERN.finditer(text):
+        link = strip_trailing_punctuation(m.group())
+        entities.append(Entity("link", link, normalize_link(link), m.start(), m.end()))
+    link_spans = [(e.start, e.end) for e in entities]
+
+    for m in ADDRESS_PATTERN.finditer(text):
+        if any(start <= m.start() < end for start, end in link_spans):
+            continue  # user@host inside a link
+        hit = classify_address(m.group())
+        if hit:
+            kind, address = hit
+            entities.append(Entity(kind, address, canonical_address(address), m.start(), m.end()))
+
+    return entities
+
+
 def get_context(text, start, end, window=60):
     return text[max(0, start - window):end + window].lower()
 
 
-def extract_intelligence(text: str):
-    text_lower = text.lower()
+def extract_intelligence(text: str, text_lower: str = None, keyword_hits=None):
+    """
+    `text_lower` and `keyword_hits` (a set of the SUSPICIOUS_KEYWORDS found
+    in it) may be passed in when the caller already has them.
+    """
+    if text_lower is None:
+        text_lower = text.lower()
 
     bank_accounts = []
     upi_ids = []
@@ -51,36 +120,17 @@ def extract_intelligence(text: str):
     classified_numbers = set()
 
     # ----------------------
-    # UPI IDs
-    # ----------------------
-    upi_ids = re.findall(
-        r"\b[a-zA-Z0-9._-]{2,}@[a-zA-Z]{2,}\b",
-        text
-    )
-
-    # ----------------------
-    # Links
-    # ----------------------
-    phishing_links = re.findall(
-        r"https?://[^\s]+",
-        text
-    )
-
-    # ----------------------
-    # Email addresses (TLD required to avoid overlapping with UPI IDs)
+    # UPI IDs, links, email addresses
     # ----------------------
-    email_addresses = re.findall(
-        r"\b[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+\.?[a-zA-Z0-9-]*\b",
-        text
-    )
+    entities = extract_entities(text)
+    upi_ids = [e.value for e in entities if e.kind == "upi"]
+    phishing_links = [e.value for e in entities if e.kind == "link"]
+    email_addresses = [e.value for e in entities if e.kind == "email"]
 
     # ----------------------
     # Phone Numbers (+91 + local)
     # ----------------------
-    phone_matches = re.finditer(
-        r"(?:\+91[\-\s]?)?[6-9]\d{9}",
-        text
-    )
+    phone_matches = PHONE_PATTERN.finditer(text)
 
     for match in phone_matches:
         raw_number = match.group()
@@ -92,10 +142,7 @@ def extract_intelligence(text: str):
     # ----------------------
     # Numeric candidates (8–18 digits)
     # ----------------------
-    numeric_matches = re.finditer(
-        r"\b\d{8,18}\b",
-        text
-    )
+    numeric_matches = NUMERIC_PATTERN.finditer(text)
 
     for match in numeric_matches:
         number = match.group()
@@ -135,49 +182,40 @@ def extract_intelligence(text: str):
     # ----------------------
     # Suspicious Keywords
     # ----------------------
+    if keyword_hits is None:
+        keyword_hits = text_lower  # plain substring search
     suspicious_keywords = [
         kw for kw in SUSPICIOUS_KEYWORDS
-        if kw in text_lower
+        if kw in keyword_hits
     ]
 
     # ----------------------
     # Case / Reference IDs (generic: case #, ref:, ticket, etc.)
     # ----------------------
     case_ids = []
-    for pattern in [
-        r"\b(?:case|ref|reference|ticket|complaint|id)[\s#:]*([a-zA-Z0-9-]{4,})\b",
-        r"\b(?:case|ref|reference)[\s#:]*(\d{4,})\b",
-    ]:
-        for m in re.finditer(pattern, text, re.IGNORECASE):
+    for pattern in CASE_ID_PATTERNS:
+        for m in pattern.finditer(text):
             case_ids.append(m.group(1).strip())
 
     # ----------------------
     # Policy numbers
     # ----------------------
-    policy_numbers = re.findall(
-        r"\bpolicy[\s#:]*(?:no\.?|number)?[\s#:]*([a-zA-Z0-9-]{3,})\b",
-        text,
-        re.IGNORECASE
-    )
+    policy_numbers = POLICY_PATTERN.findall(text)
     policy_numbers = [p.strip() for p in policy_numbers if len(p.strip()) >= 3]
 
     # ----------------------
     # Order numbers / Order IDs
     # ----------------------
-    order_numbers = re.findall(
-        r"\border[\s#:]*(?:id|no\.?|number)?[\s#:]*([a-zA-Z0-9-]{3,})\b",
-        text,
-        re.IGNORECASE
-    )
+    order_numbers = ORDER_PATTERN.findall(text)
     order_numbers = [o.strip() for o in order_numbers if len(o.strip()) >= 3]
 
     return {
         "bankAccounts": dedup_preserve_order(bank_accounts),
-        "upiIds": dedup_preserve_order(upi_ids),
-        "phishingLinks": dedup_preserve_order(phishing_links),
+        "upiIds": dedup_intel("upiIds", upi_ids),
+        "phishingLinks": dedup_intel("phishingLinks", phishing_links),
         "phoneNumbers": dedup_preserve_order(phone_numbers),
         "suspiciousKeywords": dedup_preserve_order(suspicious_keywords),
-        "emailAddresses": dedup_preserve_order(email_addresses),
+        "emailAddresses": dedup_intel("emailAddresses", email_addresses),
         "caseIds": dedup_preserve_order(case_ids),
         "policyNumbers": dedup_preserve_order(policy_numbers),
         "orderNumbers": dedup_preserve_order(order_numbers),
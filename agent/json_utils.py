@@ -1,27 +1,146 @@
 import json
 import re
 
-def safe_parse_json(text: str):
+from agent import metrics
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DecodeError = orjson.JSONDecodeError
+except ImportError:  # plain json is fine, just slower
+    _loads = json.loads
+    _DecodeError = json.JSONDecodeError
+
+LANGUAGES = ("english", "hinglish")
+
+# Schema for Gemini's structured-output mode
+REPLY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "language": {"type": "string", "enum": list(LANGUAGES)},
+        "reply": {"type": "string"},
+    },
+    "required": ["language", "reply"],
+}
+
+
+def _fail(reason: str):
+    metrics.inc("honeypot_llm_decode_failures_total", reason=reason)
+    return None
+
+
+def decode_llm_reply(text: str):
+    """
+    Decode and validate a Gemini reply.
+
+    Returns {"reply": str, "language": str | None}, or None (and counts
+    the failure) when the output cannot be used. Raw model text is never
+    passed through as a reply.
+    """
     if not text:
-        return None
+        return _fail("empty")
 
-    # Remove markdown code fences
     text = text.strip()
-    text = re.sub(r"^```(?:json)?", "", text)
-    text = re.sub(r"```$", "", text)
 
-    # Try direct parse
+    # Structured-output mode returns bare JSON; a fenced block only shows
+    # up when the model ignored the response schema
+    if text.startswith("```"):
+        text = text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+        if text.endswith("```"):
+            text = text[:-3]
+
     try:
-        return json.loads(text)
-    except:
-        pass
-
-    # Extract JSON object manually
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group())
-        except:
-            pass
-
-    return None
\ No newline at end of file
+        parsed = _loads(text)
+    except (_DecodeError, ValueError):
+        return _fail("invalid_json")
+
+    if not isinstance(parsed, dict):
+        return _fail("not_object")
+
+    reply = parsed.get("reply")
+    if not isinstance(reply, str) or not reply.strip():
+        return _fail("missing_reply")
+
+    language = parsed.get("language")
+    return {
+        "reply": reply.strip(),
+        "language": language if language in LANGUAGES else None,
+    }
+
+
+_REPLY_KEY = re.compile(r'"reply"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ReplyFieldExtractor:
+    """
+    Pulls the "reply" string out of a JSON object while it streams in.
+
+    `feed` takes the next chunk of raw model output and returns the
+    newly decoded part of the reply ("" when nothing new is complete).
+    Escape sequences split across chunks are held back until whole.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None   # index in buffer of the next undecoded reply char
+        self.done = False
+        self.value = ""
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if self.pos is None:
+            match = _REPLY_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+
+            # Escape sequence: wait for all of it
+            if i + 1 >= len(buf):
+                break
+            kind = buf[i + 1]
+            if kind in _ESCAPES:
+                out.append(_ESCAPES[kind])
+                i += 2
+            elif kind == "u":
+                if i + 6 > len(buf):
+                    break
+                code = int(buf[i + 2:i + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # High surrogate: needs its low half (\uXXXX) too
+                    if i + 12 > len(buf):
+                        break
+                    low = int(buf[i + 8:i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                else:
+                    out.append(chr(code))
+                    i += 6
+            else:
+                # Invalid escape; keep it verbatim, the full decode will reject it
+                out.append(kind)
+                i += 2
+
+        self.pos = i
+        delta = "".join(out)
+        self.value += delta
+        return delta
@@ -0,0 +1,101 @@
+import re
+
+# Romanized Hindi words that are unambiguous in chat text.
+# Short words that are also common English ("do", "to", "me", "main", "is")
+# are deliberately left out.
+HINGLISH_WORDS = frozenset([
+    "hai", "hain", "hoon", "hu", "ho", "tha", "thi", "nahi", "nahin",
+    "nhi", "kya", "kyun", "kyu", "kyon", "kaise", "kaisa", "kaun", "kaunsa",
+    "kaunsi", "kab", "kahan", "kidhar", "yeh", "ye", "woh", "wo", "aap",
+    "aapka", "aapki", "aapko", "mera", "meri", "mere", "mujhe", "hum",
+    "humko", "tum", "tumhara", "apna", "apni", "karo", "karna", "karke",
+    "kar", "kijiye", "karein", "raha", "rahe", "rahi", "gaya", "gayi",
+    "diya", "diye", "dijiye", "bhejo", "bhej", "batao", "bataiye", "bolo",
+    "bol", "ruko", "abhi", "jaldi", "turant", "paisa", "paise", "rupaye",
+    "haan", "han", "ji", "bhai", "bhaiya", "accha", "acha", "achha",
+    "theek", "thik", "sahi", "hoga", "hogi", "hoge", "warna", "nahito",
+    "lekin", "aur", "bhi", "sirf", "agar", "toh", "phir", "fir",
+    "pehle", "baad", "wala", "wali", "wale", "kuch", "sab", "samjhe",
+    "samjho", "dekho", "chahiye", "milega", "milegi", "khata",
+    "khate", "ismein", "usko", "isko", "iske", "uske", "liye",
+])
+
+# Common English words, used to stop the n-gram scorer from
+# flagging ordinary English tokens as Hinglish.
+ENGLISH_WORDS = frozenset([
+    "the", "a", "an", "is", "are", "was", "were", "be", "to", "of", "and",
+    "in", "on", "for", "your", "you", "we", "our", "it", "this", "that",
+    "with", "will", "has", "have", "please", "account", "bank", "send",
+    "share", "otp", "upi", "card", "number", "now", "immediately", "urgent",
+    "blocked", "verify", "sir", "madam", "call", "link", "click", "from",
+    "me", "my", "i", "do", "not", "can", "if", "or", "by", "at", "as",
+])
+
+# Character trigrams that are much more frequent in romanized Hindi
+# than in English, and vice versa.
+HINGLISH_TRIGRAMS = frozenset([
+    "aai", "aaj", "aap", "aan", "aay", "bha", "hai", "ahi", "kya", "iye",
+    "oon", "ega", "egi", "ogi", "oge", "nhi", "kyu", "jaa", "ruk",
+    "dek", "lag", "jiy", "hog", "kha", "ghr", "rah", "chh", "kaa", "ijo",
+])
+
+ENGLISH_TRIGRAMS = frozenset([
+    "the", "ing", "ion", "tio", "ent", "and", "you", "ver", "ter", "ate",
+    "our", "ous", "ble", "ati", "ess", "ore", "tha", "ith", "wit", "nce",
+])
+
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+WORD = re.compile(r"[a-z]+")
+
+LEXICON_MIN_HITS = 2
+LEXICON_MIN_RATIO = 0.2
+NGRAM_MIN_SCORE = 2
+
+
+def detect_language(text: str, default: str = "english") -> str:
+    """
+    Classify a message as "hinglish" or "english".
+
+    Returns `default` when the message carries no usable signal
+    (numbers, links, one-word acks), so the conversation keeps its
+    current language instead of flipping on noise.
+    """
+    if not text:
+        return default
+
+    if DEVANAGARI.search(text):
+        return "hinglish"
+
+    words = WORD.findall(text.lower())
+    if not words:
+        return default
+
+    # ----------------------
+    # Lexicon
+    # ----------------------
+    hits = sum(1 for w in words if w in HINGLISH_WORDS)
+    if hits >= LEXICON_MIN_HITS or (hits and hits / len(words) >= LEXICON_MIN_RATIO):
+        return "hinglish"
+
+    # ----------------------
+    # Character trigrams on unknown words
+    # ----------------------
+    score = 0
+    for w in words:
+        if w in ENGLISH_WORDS or len(w) < 3:
+            continue
+        for i in range(len(w) - 2):
+            gram = w[i:i + 3]
+            if gram in HINGLISH_TRIGRAMS:
+                score += 1
+            elif gram in ENGLISH_TRIGRAMS:
+                score -= 1
+
+    if score >= NGRAM_MIN_SCORE:
+        return "hinglish"
+
+    english = sum(1 for w in words if w in ENGLISH_WORDS)
+    if hits == 0 and (english >= 2 or score < 0):
+        return "english"
+
+    return default
@@ -1,35 +1,59 @@
+from agent.load_control import load_controller
+
+# Per-session LLM budget, shrinking as process load rises
+MAX_CALLS_BY_MODE = {"normal": 12, "conserve": 6, "critical": 3}
+
+HIGH_VALUE_STRATEGIES = {
+    "extract_payment",
+    "extract_identity",
+    "extract_bank",
+    "escalate_trust"
+}
+
+# extract_payment is chosen on most turns until a UPI ID shows up,
+# so under critical load only the narrower extractions stay exempt
+CRITICAL_STRATEGIES = {"extract_identity", "extract_bank"}
+
+
 def should_use_llm(strategy: str, agent_state: dict, session: dict) -> bool:
 
     turns = agent_state.get("turns", 0)
     llm_calls = agent_state.get("llm_calls", 0)
     confidence = session.get("scam_confidence", 0)
 
-    MAX_CALLS = 12
+    # -------------------------
+    # Process load (adaptive shedding)
+    # -------------------------
+    mode = load_controller.mode()
+
+    if mode == "template_only":
+        return False
 
     # -------------------------
     # Hard Cap
     # -------------------------
-    if llm_calls >= MAX_CALLS:
+    if llm_calls >= MAX_CALLS_BY_MODE[mode]:
         return False
 
     # -------------------------
     # Phase 1: Hook (first 2 turns)
     # -------------------------
-    if turns <= 1:
+    if turns <= 1 and mode != "critical":
         return True
 
     # -------------------------
-    # High-value extraction always allowed
+    # High-value extraction
+    # (every turn normally, every
+    # other turn when conserving)
     # -------------------------
-    high_value_strategies = {
-        "extract_payment",
-        "extract_identity",
-        "extract_bank",
-        "escalate_trust"
-    }
+    if mode == "critical":
+        return strategy in CRITICAL_STRATEGIES
 
-    if strategy in high_value_strategies:
-        return True
+    if strategy in HIGH_VALUE_STRATEGIES:
+        return mode == "normal" or turns % 2 == 0
+
+    if mode != "normal":
+        return False
 
     # -------------------------
     # If scam likelihood is high,
@@ -40,8 +64,10 @@ def should_use_llm(strategy: str, agent_state: dict, session: dict) -> bool:
 
     # -------------------------
     # Light refresh every 6 turns
+    # (language is detected locally, so
+    # templates no longer drift from it)
     # -------------------------
-    if turns % 3 == 0 and llm_calls < 10:
+    if turns % 6 == 0 and llm_calls < 10:
         return True
 
     # -------------------------
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from agent import metrics
+
+# Load modes, from least to most restrictive:
+#   normal        - per-session gating only
+#   conserve      - hook turns and every other high-value turn, 6 calls per session
+#   critical      - identity/bank extraction turns only, 3 calls per session
+#   template_only - no LLM calls at all
+MODES = ["normal", "conserve", "critical", "template_only"]
+
+# Thresholds at which each signal pushes the mode to conserve / critical / template_only
+LATENCY_THRESHOLDS = (4.0, 8.0, 15.0)      # p90 Gemini latency, seconds
+ERROR_RATE_THRESHOLDS = (0.2, 0.4, 0.6)    # share of failed Gemini calls
+LLM_IN_FLIGHT_THRESHOLDS = (16, 32, 48)    # concurrent Gemini calls
+QUEUE_DEPTH_THRESHOLDS = (10, 40, 100)     # requests waiting for a worker thread
+
+SAMPLE_WINDOW_SECONDS = 60
+MIN_SAMPLES = 5
+RECOVERY_SECONDS = 30  # pressure must stay lower this long before relaxing one step
+
+# Sync endpoints run on a thread pool; requests beyond its size are queued
+REQUEST_CONCURRENCY = int(os.getenv("REQUEST_CONCURRENCY", "40"))
+
+
+def _level(value, thresholds):
+    level = 0
+    for i, threshold in enumerate(thresholds):
+        if value >= threshold:
+            level = i + 1
+    return level
+
+
+class LoadController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque()  # (finished_at, latency, ok)
+        self._llm_in_flight = 0
+        self._requests_in_flight = 0
+        self._mode = 0
+        self._calm_since = None
+
+    # -----------------------------
+    # Signals
+    # -----------------------------
+
+    def request_started(self):
+        with self._lock:
+            self._requests_in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self._requests_in_flight -= 1
+
+    @contextmanager
+    def _in_llm(self):
+        with self._lock:
+            self._llm_in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._llm_in_flight -= 1
+
+    def _record(self, latency, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    @contextmanager
+    def llm_call(self):
+        """Wrap a Gemini call; records its latency and whether it raised."""
+        started = time.monotonic()
+        ok = False
+        try:
+            with self._in_llm():
+                yield
+            ok = True
+        finally:
+            self._record(time.monotonic() - started, ok)
+
+    def llm_stream(self, start):
+        """
+        Iterate a streamed Gemini response opened by `start()`. Only the
+        time spent inside Gemini counts as latency, not the time the
+        consumer holds each chunk, and only Gemini raising is an error:
+        a consumer that stops early (client hung up) is not.
+        """
+        busy, ok = 0.0, True
+        try:
+            chunks = None
+            while True:
+                started = time.monotonic()
+                try:
+                    with self._in_llm():
+                        if chunks is None:
+                            chunks = iter(start())
+                        chunk = next(chunks)
+                except StopIteration:
+                    return
+                except Exception:
+                    ok = False
+                    raise
+                finally:
+                    busy += time.monotonic() - started
+                yield chunk
+        finally:
+            self._record(busy, ok)
+
+    @property
+    def llm_in_flight(self):
+        return self._llm_in_flight
+
+    @property
+    def requests_in_flight(self):
+        return self._requests_in_flight
+
+    # -----------------------------
+    # Mode
+    # -----------------------------
+
+    def _pressure(self, now):
+        while self._samples and now - self._samples[0][0] > SAMPLE_WINDOW_SECONDS:
+            self._samples.popleft()
+
+        stats = {
+            "llm_in_flight": self._llm_in_flight,
+            "queue_depth": max(0, self._requests_in_flight - REQUEST_CONCURRENCY),
+            "latency_p90": 0.0,
+            "error_rate": 0.0,
+        }
+        if len(self._samples) >= MIN_SAMPLES:
+            latencies = sorted(s[1] for s in self._samples)
+            stats["latency_p90"] = latencies[int(len(latencies) * 0.9) - 1]
+            stats["error_rate"] = sum(1 for s in self._samples if not s[2]) / len(self._samples)
+
+        level = max(
+            _level(stats["latency_p90"], LATENCY_THRESHOLDS),
+            _level(stats["error_rate"], ERROR_RATE_THRESHOLDS),
+            _level(stats["llm_in_flight"], LLM_IN_FLIGHT_THRESHOLDS),
+            _level(stats["queue_depth"], QUEUE_DEPTH_THRESHOLDS),
+        )
+        return level, stats
+
+    def mode(self) -> str:
+        """
+        Current load mode. Tightens immediately when pressure rises,
+        relaxes one step at a time after RECOVERY_SECONDS of lower pressure.
+        """
+        now = time.monotonic()
+        with self._lock:
+            level, stats = self._pressure(now)
+
+            if level >= self._mode:
+                self._mode = level
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= RECOVERY_SECONDS:
+                self._mode -= 1
+                self._calm_since = now if self._mode > level else None
+
+            mode = self._mode
+
+        metrics.set_gauge("honeypot_load_mode", mode)
+        for name, value in stats.items():
+            metrics.set_gauge(f"honeypot_{name}", value)
+        return MODES[mode]
+
+
+load_controller = LoadController()
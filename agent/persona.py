@@ -1,4 +1,4 @@
-def build_prompt(history, strategy, incoming_text):
+def build_prompt(history, strategy, incoming_text, language="english"):
     conversation = "\n".join(
         [f"{m['sender']}: {m['text']}" for m in history[-6:]]
     )
@@ -11,9 +11,9 @@ UPI (Unified Payments Interface) is India’s instant digital payment system tha
 You might be asked to make payments via UPI like an indian person uses it.
 
 Your tasks:
-1. Decide the language of reply:
-   - Use "hinglish" ONLY if the other person uses Hindi/Hinglish words.
-   - Otherwise use "english".
+1. The other person is writing in {language}. Reply in {language}:
+   - "hinglish" means Hindi written in English letters, mixed with English words.
+   - Switch language ONLY if the latest message clearly uses the other one.
 2. Reply naturally in the chosen language.
 
 Rules:
@@ -36,7 +36,7 @@ Latest message:
 
 Respond STRICTLY in JSON:
 {{
-  "language": "last language used",
+  "language": "english or hinglish",
   "reply": "text"
 }}
 """
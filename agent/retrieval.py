@@ -0,0 +1,90 @@
+import re
+import threading
+from collections import deque
+
+# Middle reply tier: past LLM replies, indexed by (strategy, language)
+# and by the salient keywords of the scammer message that triggered them.
+# The index is per process and starts empty; it warms up from live traffic.
+
+RETRIEVAL_MIN_SIMILARITY = 0.5
+RETRIEVAL_MIN_KEYWORDS = 2
+MAX_REPLIES_PER_BUCKET = 200
+
+STOPWORDS = frozenset([
+    "the", "and", "for", "you", "your", "are", "was", "this", "that", "with",
+    "have", "has", "will", "can", "not", "now", "please", "from", "our",
+    "sir", "madam", "dear", "hello", "just", "here", "there", "what", "then",
+    "hai", "hain", "aap", "aapka", "aapko", "kya", "nahi", "karo", "kar",
+    "abhi", "bhi", "aur", "toh", "mera", "meri",
+])
+
+WORD = re.compile(r"https?://\S+|[\w.-]+@[a-z]+|\d+|[a-z]+")
+
+_index = {}
+_lock = threading.Lock()
+
+
+def salient_keywords(text: str) -> frozenset:
+    """Content words of a message, with entities collapsed to their type."""
+    keywords = set()
+    for token in WORD.findall(text.lower()):
+        if token.startswith("http"):
+            keywords.add("<link>")
+        elif "@" in token:
+            keywords.add("<upi>")
+        elif token.isdigit():
+            keywords.add("<number>")
+        elif len(token) >= 3 and token not in STOPWORDS:
+            keywords.add(token)
+    return frozenset(keywords)
+
+
+def _reusable(reply: str) -> bool:
+    # Replies quoting numbers, handles or links belong to one conversation
+    return not any(ch.isdigit() for ch in reply) and "@" not in reply and "http" not in reply
+
+
+def remember_reply(strategy: str, language: str, scammer_text: str, reply: str) -> None:
+    """Index a successful LLM reply for later reuse."""
+    if not reply or not _reusable(reply):
+        return
+
+    keywords = salient_keywords(scammer_text)
+    if len(keywords) < RETRIEVAL_MIN_KEYWORDS:
+        return
+
+    with _lock:
+        bucket = _index.get((strategy, language))
+        if bucket is None:
+            bucket = _index[(strategy, language)] = deque(maxlen=MAX_REPLIES_PER_BUCKET)
+        if any(reply == stored for _, stored in bucket):
+            return
+        bucket.append((keywords, reply))
+
+
+def find_reply(strategy: str, language: str, scammer_text: str, exclude=()):
+    """
+    Return the stored reply whose trigger message is most similar
+    (Jaccard over salient keywords), or None below the threshold.
+    """
+    keywords = salient_keywords(scammer_text)
+    if len(keywords) < RETRIEVAL_MIN_KEYWORDS:
+        return None
+
+    with _lock:
+        bucket = list(_index.get((strategy, language), ()))
+
+    best_reply = None
+    best_score = RETRIEVAL_MIN_SIMILARITY
+    for stored_keywords, reply in bucket:
+        if reply in exclude:
+            continue
+        shared = len(keywords & stored_keywords)
+        if not shared:
+            continue
+        score = shared / len(keywords | stored_keywords)
+        if score >= best_score:
+            best_score = score
+            best_reply = reply
+
+    return best_reply
@@ -1,4 +1,4 @@
-def choose_strategy(session, incoming_text, reflection=None):
+def choose_strategy(session, incoming_text, reflection=None, analysis=None):
     intel = session.get("intelligence", {})
     agent_state = session.get("agent_state", {})
 
@@ -10,7 +10,10 @@ def choose_strategy(session, incoming_text, reflection=None):
     banks = intel.get("bankAccounts", [])
     keywords = intel.get("suspiciousKeywords", [])
 
-    text = incoming_text.lower()
+    if analysis is not None:
+        mentions_otp = "otp" in analysis.hits
+    else:
+        mentions_otp = "otp" in incoming_text.lower()
 
     # ---------------------------
     # Reflection-based override
@@ -24,7 +27,7 @@ def choose_strategy(session, incoming_text, reflection=None):
     # ---------------------------
     # OTP / technical scam path
     # ---------------------------
-    if "otp" in text and turns < 8:
+    if mentions_otp and turns < 8:
         return "extract_identity"
 
     # ---------------------------
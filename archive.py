@@ -0,0 +1,211 @@
+"""
+Cold storage for finished sessions.
+
+Sessions are appended to compressed segment files on local disk:
+
+    <ARCHIVE_DIR>/<segment>.seg   records: 4-byte big-endian length + zlib(JSON)
+    <ARCHIVE_DIR>/<segment>.idx   one line per record: sessionId, offset, length, messages
+
+Each process writes its own segments (named by start time and pid), so
+multi-worker deployments never interleave writes. Readers memory-map the
+segments and only touch the bytes of the records they decode.
+
+    python archive.py sweep [--window SECONDS]   archive sessions about to expire
+    python archive.py get <sessionId>            print one archived session
+    python archive.py scan                       print every archived sessionId
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")  # archiving is disabled when unset
+SEGMENT_MAX_BYTES = int(os.getenv("ARCHIVE_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+EXPIRY_WINDOW_SECONDS = 300
+
+HEADER = struct.Struct(">I")
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentWriter:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._seg = None
+        self._idx = None
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        self.close()
+        self._seq += 1
+        name = f"{int(time.time())}-{os.getpid()}-{self._seq:04d}"
+        self._seg = open(os.path.join(self.directory, name + ".seg"), "ab")
+        self._idx = open(os.path.join(self.directory, name + ".idx"), "a", encoding="utf-8")
+
+    def append(self, session_id: str, session: dict) -> None:
+        record = {
+            "sessionId": session_id,
+            "archivedAt": time.time(),
+            "session": session,
+        }
+        data = zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        messages = len(session.get("messages", []))
+
+        with self._lock:
+            if self._seg is None or self._seg.tell() >= SEGMENT_MAX_BYTES:
+                self._rotate()
+            offset = self._seg.tell()
+            self._seg.write(HEADER.pack(len(data)) + data)
+            self._seg.flush()
+            # Index is written after the record, so a reader never sees
+            # an offset whose bytes are not on disk yet
+            self._idx.write(f"{session_id}\t{offset}\t{len(data)}\t{messages}\n")
+            self._idx.flush()
+
+    def close(self):
+        for f in (self._seg, self._idx):
+            if f is not None:
+                f.close()
+        self._seg = None
+        self._idx = None
+
+
+class ArchiveReader:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index = {}  # sessionId -> (segment path, offset, length, messages)
+        self.reload()
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-4] for name in os.listdir(self.directory)
+            if name.endswith(".seg")
+        )
+
+    def reload(self) -> None:
+        """Rebuild the in-memory offset index; the newest copy of a session wins."""
+        index = {}
+        for name in self._segments():
+            idx_path = os.path.join(self.directory, name + ".idx")
+            seg_path = os.path.join(self.directory, name + ".seg")
+            if not os.path.exists(idx_path):
+                continue
+            with open(idx_path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4:
+                        continue  # torn last line
+                    session_id, offset, length, messages = parts
+                    index[session_id] = (seg_path, int(offset), int(length), int(messages))
+        self.index = index
+
+    def fetch(self, session_id: str):
+        """Return the archived record for `session_id`, or None."""
+        entry = self.index.get(session_id)
+        if entry is None:
+            return None
+        seg_path, offset, length, _ = entry
+        with open(seg_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = offset + HEADER.size
+            return json.loads(zlib.decompress(mm[start:start + length]))
+
+    def scan(self):
+        """Yield every archived record in write order, one segment at a time."""
+        for name in self._segments():
+            seg_path = os.path.join(self.directory, name + ".seg")
+            with open(seg_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    pos = 0
+                    while pos + HEADER.size <= len(mm):
+                        (length,) = HEADER.unpack_from(mm, pos)
+                        start = pos + HEADER.size
+                        if start + length > len(mm):
+                            break  # partially written tail
+                        yield json.loads(zlib.decompress(mm[start:start + length]))
+                        pos = start + length
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def archive_session(session_id: str, session: dict) -> None:
+    """Append a session to cold storage. No-op unless ARCHIVE_DIR is set."""
+    global _writer
+
+    if not ARCHIVE_DIR:
+        return
+
+    try:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SegmentWriter(ARCHIVE_DIR)
+        _writer.append(session_id, session)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error("Archive write failed for session %s: %s", session_id, e)
+
+
+def archive_expiring_sessions(window: int = EXPIRY_WINDOW_SECONDS) -> int:
+    """
+    Archive sessions whose TTL is below `window` seconds.
+
+    Meant to run periodically (every window/2 or so). Sessions whose
+    archived copy already has the same number of messages are skipped.
+    """
+    from redis_client import redis_client, redis_bytes_client
+    from redis_keys import session_id_from_key
+    from session_codec import decode_session
+
+    reader = ArchiveReader(ARCHIVE_DIR)
+    archived = 0
+
+    for key in redis_client.scan_iter(match="session:*", count=500):
+        ttl = redis_client.ttl(key)
+        if ttl < 0 or ttl > window:
+            continue
+        raw = redis_bytes_client.get(key)
+        if not raw:
+            continue
+        session = decode_session(raw)
+        session_id = session_id_from_key(key)
+        entry = reader.index.get(session_id)
+        if entry and entry[3] == len(session.get("messages", [])):
+            continue
+        archive_session(session_id, session)
+        archived += 1
+
+    return archived
+
+
+if __name__ == "__main__":
+    if not ARCHIVE_DIR:
+        sys.exit("ARCHIVE_DIR is not set")
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "scan"
+
+    if command == "sweep":
+        window = EXPIRY_WINDOW_SECONDS
+        if "--window" in sys.argv:
+            window = int(sys.argv[sys.argv.index("--window") + 1])
+        print(f"archived {archive_expiring_sessions(window)} sessions")
+    elif command == "get":
+        record = ArchiveReader(ARCHIVE_DIR).fetch(sys.argv[2])
+        if record is None:
+            sys.exit("not found")
+        print(json.dumps(record, indent=2, ensure_ascii=False))
+    elif command == "scan":
+        for record in ArchiveReader(ARCHIVE_DIR).scan():
+            print(record["sessionId"])
+    else:
+        sys.exit(f"unknown command: {command}")
@@ -0,0 +1,164 @@
+"""
+Intelligence event stream for downstream consumers.
+
+Each turn appends compact events to the Redis Stream EVENT_STREAM:
+
+    type=intel          data={"new": {"upiIds": [...], ...}}   newly extracted indicators
+    type=scam_detected  data={"confidence": 7}                 scam status flipped to detected
+    type=finalized      data={"scamType": ..., "messages": n}  session finalized
+
+plus sid (sessionId) and ts (epoch seconds). The stream is capped at
+about EVENT_STREAM_MAXLEN entries. Consumers read through consumer
+groups, so each group sees every event once and can scale out:
+
+    python events.py consume <group> <consumer>
+
+Events are only published with a Redis-backed session store.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from redis.exceptions import RedisError, ResponseError
+
+import session_store
+
+EVENT_STREAM = os.getenv("EVENT_STREAM", "honeypot:events")
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+
+INTEL_FIELDS = (
+    "upiIds", "phoneNumbers", "phishingLinks", "bankAccounts", "emailAddresses",
+    "caseIds", "policyNumbers", "orderNumbers", "suspiciousKeywords",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _client():
+    backend = session_store.backend
+    if isinstance(backend, session_store.RedisBackend):
+        return backend.client
+    return None
+
+
+def snapshot(session: dict) -> dict:
+    """What a later `publish_changes` compares against."""
+    intelligence = session.get("intelligence", {})
+    return {
+        "intel": {k: len(intelligence.get(k, [])) for k in INTEL_FIELDS},
+        "scam_detected": session.get("scam_detected", False),
+    }
+
+
+def _event(event_type, session_id, data):
+    return {
+        "type": event_type,
+        "sid": session_id,
+        "ts": f"{time.time():.3f}",
+        "data": json.dumps(data, separators=(",", ":"), ensure_ascii=False),
+    }
+
+
+def _publish(events) -> None:
+    client = _client()
+    if client is None or not events:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(EVENT_STREAM, event, maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+    except RedisError as e:
+        logger.error("Event publish failed: %s", e)
+
+
+def new_intel(before: dict, session: dict) -> dict:
+    """Indicators extracted since `before`, by field (fields without any omitted)."""
+    intelligence = session.get("intelligence", {})
+    # Intel lists only ever grow at the end
+    return {
+        k: intelligence[k][before["intel"].get(k, 0):]
+        for k in INTEL_FIELDS
+        if len(intelligence.get(k, [])) > before["intel"].get(k, 0)
+    }
+
+
+def publish_changes(session_id: str, before: dict, session: dict) -> None:
+    """Publish intel and scam-status events for what changed since `before`."""
+    events = []
+
+    new = new_intel(before, session)
+    if new:
+        events.append(_event("intel", session_id, {"new": new}))
+
+    if session.get("scam_detected") and not before["scam_detected"]:
+        events.append(_event("scam_detected", session_id, {"confidence": session.get("scam_confidence", 0)}))
+
+    _publish(events)
+
+
+def publish_finalized(session_id: str, session: dict, scam_type: str) -> None:
+    _publish([_event("finalized", session_id, {
+        "scamType": scam_type,
+        "messages": len(session.get("messages", [])),
+        "confidence": session.get("scam_confidence", 0),
+    })])
+
+
+# -----------------------------
+# CONSUMERS
+# -----------------------------
+
+def _decode(fields) -> dict:
+    event = dict(fields)
+    event["data"] = json.loads(event.get("data", "{}"))
+    return event
+
+
+def ensure_group(group: str, start_id: str = "$") -> None:
+    try:
+        _client().xgroup_create(EVENT_STREAM, group, id=start_id, mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consume(group: str, consumer: str, count: int = 100, block_ms: int = 5000):
+    """
+    Next batch of (event id, event) for this consumer. Messages stay
+    pending until acked; crashed consumers' entries can be taken over
+    with `claim_stale`.
+    """
+    response = _client().xreadgroup(group, consumer, {EVENT_STREAM: ">"}, count=count, block=block_ms)
+    return [
+        (event_id, _decode(fields))
+        for _, entries in response or []
+        for event_id, fields in entries
+    ]
+
+
+def ack(group: str, event_ids) -> None:
+    if event_ids:
+        _client().xack(EVENT_STREAM, group, *event_ids)
+
+
+def claim_stale(group: str, consumer: str, min_idle_ms: int = 60000, count: int = 100):
+    """Take over events another consumer read but never acked."""
+    _, entries, *_ = _client().xautoclaim(EVENT_STREAM, group, consumer, min_idle_ms, count=count)
+    return [(event_id, _decode(fields)) for event_id, fields in entries if fields]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "consume":
+        sys.exit("usage: python events.py consume <group> <consumer>")
+    if _client() is None:
+        sys.exit("events need a Redis-backed SESSION_BACKEND")
+
+    group, consumer = sys.argv[2], sys.argv[3]
+    ensure_group(group, start_id="0")
+    while True:
+        batch = consume(group, consumer)
+        for event_id, event in batch:
+            print(json.dumps({"id": event_id, **event}, ensure_ascii=False), flush=True)
+        ack(group, [event_id for event_id, _ in batch])
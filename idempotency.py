@@ -0,0 +1,61 @@
+import hashlib
+import logging
+from redis.exceptions import RedisError
+
+import session_store
+from redis_keys import turn_key as _turn_key
+
+# A retried POST carries the same (sessionId, message.timestamp, text).
+# The first request claims the turn; the reply it produces is stored
+# under the same key so retries get it back without re-running the agent.
+
+TURN_TTL_SECONDS = 300
+PENDING = "\x00pending"
+
+logger = logging.getLogger(__name__)
+
+
+def turn_key(session_id: str, timestamp, text: str) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    return _turn_key(session_id, timestamp, digest)
+
+
+def claim_turn(key: str):
+    """
+    Claim a turn for processing.
+
+    Returns None when the caller should run the agent, the stored reply
+    when the turn was already answered, or PENDING when another request
+    is still working on it. Never waits: a retry storm must not hold
+    worker threads while the original request runs.
+    """
+    try:
+        if session_store.backend.set_value(key, PENDING, TURN_TTL_SECONDS, only_if_missing=True):
+            return None
+
+        stored = session_store.backend.get_value(key)
+        if stored is None:
+            # Claim expired or was released after a failure; take it over
+            if session_store.backend.set_value(key, PENDING, TURN_TTL_SECONDS, only_if_missing=True):
+                return None
+            stored = session_store.backend.get_value(key)
+        return PENDING if stored is None else stored
+
+    except RedisError as e:
+        logger.error("Idempotency check failed, processing turn anyway: %s", e)
+        return None
+
+
+def store_reply(key: str, reply: str) -> None:
+    try:
+        session_store.backend.set_value(key, reply, TURN_TTL_SECONDS)
+    except RedisError as e:
+        logger.error("Idempotency store failed: %s", e)
+
+
+def release_turn(key: str) -> None:
+    """Drop a claim whose processing failed, so a retry can run the turn."""
+    try:
+        session_store.backend.delete_value(key)
+    except RedisError as e:
+        logger.error("Idempotency release failed: %s", e)
@@ -2,31 +2,69 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import requests
+import json
 import os
 import logging
 import time
+import asyncio
+from contextlib import asynccontextmanager, ExitStack
 from typing import List, Dict, Optional, Union
 
-from session_store import get_session, save_session
-from agent.agent import agent_step
+from session_store import get_session, save_session, SessionConflict
+from archive import archive_session
+from idempotency import turn_key, claim_turn, store_reply, release_turn, PENDING
+from tracing import install as install_tracing, trace_request, resume as resume_trace
+import events
+import stats
+from quotas import authenticate, admit_request, acquire_llm, ApiClient
+from agent.agent import agent_step, agent_step_stream
 from agent.agent import rebuild_state_from_history
+from agent.load_control import load_controller
+from agent.language import detect_language
+from agent.templates import get_template_reply
+from agent import metrics
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-API_KEY = os.getenv("API_KEY")
 REDIS_URL = os.getenv("REDIS_URL")
 
-if not REDIS_URL:
+if not REDIS_URL and os.getenv("SESSION_BACKEND", "redis") != "memory":
     raise ValueError("REDIS_URL environment variable is required")
 
+SHUTDOWN_TIMEOUT_SECONDS = int(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "30"))
+# A turn whose save lost a race with another worker is redone on the fresh session
+TURN_ATTEMPTS = 2
+
 CALLBACK_URL = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
 
-app = FastAPI(title="Agentic Honeypot API", version="1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Server has stopped accepting requests; give in-flight turns
+    # (Gemini calls, result callbacks) time to finish
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if load_controller.requests_in_flight <= 0 and load_controller.llm_in_flight <= 0:
+            return
+        await asyncio.sleep(0.1)
+    logger.warning(
+        "Shutdown timeout: %d requests, %d Gemini calls still in flight",
+        load_controller.requests_in_flight,
+        load_controller.llm_in_flight,
+    )
+
+
+app = FastAPI(title="Agentic Honeypot API", version="1.0", lifespan=lifespan)
+
+install_tracing()
 
 
 
@@ -62,20 +100,66 @@ def health():
     return {"status": "backend running"}
 
 
+class InFlightMiddleware:
+    """Counts requests until their response body is fully sent (streams included)."""
 
-@app.post("/api/honeypot")
-def honeypot(
-    body: HoneypotRequest,
-    x_api_key: Optional[str] = Header(None, alias="x-api-key"),
-):
-    
-    if not x_api_key or x_api_key != API_KEY:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        load_controller.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            load_controller.request_finished()
+
+
+app.add_middleware(InFlightMiddleware)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    load_controller.mode()  # refresh load gauges
+    return metrics.render()
+
+
+def _authenticate(x_api_key: Optional[str]) -> ApiClient:
+    client = authenticate(x_api_key)
+    if client is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
+    return client
+
+
+def _admit(client: ApiClient) -> None:
+    if not admit_request(client):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+
+def _check_api_key(x_api_key: Optional[str]) -> ApiClient:
+    client = _authenticate(x_api_key)
+    _admit(client)
+    return client
 
-    session_id = body.sessionId
-    incoming_text = body.message.text
 
-    session = get_session(session_id)
+def _admit_turn(client: ApiClient, key: str) -> None:
+    """Count a turn that will run against the caller's quota, or give up its claim."""
+    try:
+        _admit(client)
+    except HTTPException:
+        release_turn(key)
+        raise
+
+
+def _llm_permit(client: ApiClient):
+    return lambda: acquire_llm(client)
+
+
+def _load_session(body: HoneypotRequest, client: ApiClient):
+    """The session with history applied, plus an event snapshot taken before it."""
+    session = get_session(body.sessionId)
+    before = events.snapshot(session)
 
     if body.metadata:
         session["channel"] = body.metadata.get("channel")
@@ -90,19 +174,19 @@ def honeypot(
 
     for msg in (body.conversationHistory or []):
         if msg.get("sender") == "scammer":
-            agent_step(session, msg.get("text", ""))
-
+            agent_step(session, msg.get("text", ""), llm_permit=_llm_permit(client))
 
-    
-    agent_output = agent_step(session, incoming_text)
+    return session, before
 
-   
-    save_session(session_id, session)
 
-   
+def _finalize_if_needed(session_id: str, session: dict, agent_output: dict) -> None:
     if agent_output["should_finalize"] and not session.get("finalized", False):
         session["finalized"] = True
-        save_session(session_id, session)
+        try:
+            save_session(session_id, session)
+        except SessionConflict:
+            logger.warning("Session %s changed before it was marked finalized", session_id)
+        archive_session(session_id, session)
 
         intelligence = session.get("intelligence", {})
         engagement_duration_seconds = int(
@@ -110,6 +194,8 @@ def honeypot(
         )
         # Infer scam type for optional scoring (doc: scamType 1 pt optional)
         scam_type = _infer_scam_type(intelligence)
+        events.publish_finalized(session_id, session, scam_type)
+        stats.record_finalized(scam_type)
         payload = {
             "sessionId": session_id,
             "scamDetected": session.get("scam_detected", False),
@@ -136,15 +222,191 @@ def honeypot(
         except Exception as e:
             logger.error("Callback failed: %s", e)
 
-   
+
+def _run_turn(body: HoneypotRequest, client: ApiClient) -> dict:
+    for attempt in range(TURN_ATTEMPTS):
+        session, before = _load_session(body, client)
+
+        agent_output = agent_step(session, body.message.text, llm_permit=_llm_permit(client))
+
+        try:
+            save_session(body.sessionId, session)
+            break
+        except SessionConflict:
+            if attempt == TURN_ATTEMPTS - 1:
+                raise
+            logger.warning("Session %s changed during the turn, redoing it", body.sessionId)
+    events.publish_changes(body.sessionId, before, session)
+    stats.record_turn(body.sessionId, before, session, agent_output)
+
+    _finalize_if_needed(body.sessionId, session, agent_output)
+
+    return agent_output
+
+
+@app.get("/api/stats")
+def stats_endpoint(x_api_key: Optional[str] = Header(None, alias="x-api-key")):
+    """Live aggregates (active sessions, last hour, today); constant time."""
+    _check_api_key(x_api_key)
+    return stats.read_stats()
+
+
+def _stall_reply(body: HoneypotRequest) -> str:
+    # The original request is still running; stall without touching the session
+    return get_template_reply("delay", detect_language(body.message.text), [])
+
+
+@app.post("/api/honeypot")
+def honeypot(
+    body: HoneypotRequest,
+    x_api_key: Optional[str] = Header(None, alias="x-api-key"),
+):
+    client = _authenticate(x_api_key)
+
+    # Retries of an already answered turn get the stored reply back,
+    # without counting against the request quota
+    key = turn_key(body.sessionId, body.message.timestamp, body.message.text)
+    stored = claim_turn(key)
+
+    if stored == PENDING:
+        return {"status": "success", "reply": _stall_reply(body)}
+
+    if stored is not None:
+        return {"status": "success", "reply": stored}
+
+    _admit_turn(client, key)
+
+    try:
+        with trace_request(body.dict()) as trace:
+            agent_output = _run_turn(body, client)
+            reply = agent_output["reply"]
+            trace["reply"] = reply
+            trace["reply_source"] = agent_output["reply_source"]
+    except Exception:
+        release_turn(key)
+        raise
+
+    store_reply(key, reply)
+
     return {
         "status": "success",
-        "reply": agent_output["reply"],
+        "reply": reply,
     }
 
 
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+
+def _sse_deltas(steps):
+    """Forward agent_step_stream's deltas as SSE events; returns its result."""
+    while True:
+        try:
+            delta = next(steps)
+        except StopIteration as done:
+            return done.value
+        yield _sse(delta)
+
+
+class _TurnStream(StreamingResponse):
+    """
+    Runs `on_close` once the response is over, however it ended: also when
+    the client hung up before the body generator was ever started, where
+    the generator's own cleanup would never run.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await run_in_threadpool(self.on_close)
+
+
+@app.post("/api/honeypot/stream")
+def honeypot_stream(
+    body: HoneypotRequest,
+    x_api_key: Optional[str] = Header(None, alias="x-api-key"),
+):
+    """
+    Same turn as /api/honeypot, streamed as Server-Sent Events:
+
+        data: {"delta": "..."}                        pieces of the reply
+        event: done
+        data: {"status": "success", "reply": "..."}   the full reply
+
+    A template fallback arrives as one delta event; it carries
+    "replace": true if Gemini had already streamed part of a reply.
+    The session is saved only once the reply is complete.
+    """
+    client = _authenticate(x_api_key)
+
+    key = turn_key(body.sessionId, body.message.timestamp, body.message.text)
+    stored = claim_turn(key)
+
+    if stored is not None:
+        reply = _stall_reply(body) if stored == PENDING else stored
+        stored_events = [_sse({"delta": reply}), _sse({"status": "success", "reply": reply}, event="done")]
+        return StreamingResponse(iter(stored_events), media_type="text/event-stream")
+
+    _admit_turn(client, key)
+
+    with ExitStack() as stack:
+        trace = stack.enter_context(trace_request(body.dict()))
+        try:
+            session, before = _load_session(body, client)
+        except Exception:
+            release_turn(key)
+            raise
+        # The trace stays open until the response is done
+        traced = stack.pop_all()
+
+    committed = False
+
+    def sse_events():
+        nonlocal committed
+        resume_trace(trace)
+        steps = agent_step_stream(session, body.message.text, llm_permit=_llm_permit(client))
+        agent_output = yield from _sse_deltas(steps)
+        reply = agent_output["reply"]
+
+        save_session(body.sessionId, session)
+        store_reply(key, reply)
+        committed = True
+        events.publish_changes(body.sessionId, before, session)
+        stats.record_turn(body.sessionId, before, session, agent_output)
+        trace["reply"] = reply
+        trace["reply_source"] = agent_output["reply_source"]
+
+        # Before "done": a client that hangs up after it closes the
+        # generator, which would skip finalization and the callback
+        _finalize_if_needed(body.sessionId, session, agent_output)
+
+        yield _sse({"status": "success", "reply": reply}, event="done")
+
+    body_events = sse_events()
+
+    def close():
+        body_events.close()
+        if not committed:
+            release_turn(key)
+        traced.close()
+
+    return _TurnStream(body_events, on_close=close, media_type="text/event-stream")
+
+
 
 if __name__ == "__main__":
-    import uvicorn
+    import sys
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+
+    if "--prod" in sys.argv:
+        from server import run
+        run(app, port)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=port, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT_SECONDS)
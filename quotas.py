@@ -0,0 +1,233 @@
+"""
+Per-API-key request quotas and weighted fair sharing of LLM capacity.
+
+API_KEYS holds the callers as JSON:
+
+    {"<api key>": {"name": "whatsapp", "requests_per_minute": 600,
+                   "llm_calls_per_minute": 60, "weight": 2}, ...}
+
+Missing limits (or 0) mean unlimited. Without API_KEYS, the single
+API_KEY is accepted as client "default" with no limits.
+
+LLM capacity (LLM_CAPACITY_PER_MINUTE, 0 = unlimited) is shared between
+the clients active in the current minute in proportion to their weight.
+While the pool is below LLM_BORROW_THRESHOLD of capacity, any client may
+go past its share, so idle capacity is never wasted; above it, each
+client is held to its weighted share.
+
+Clients count as active once they ask for an LLM call in the window.
+
+Counters are fixed one-minute windows, updated atomically by Lua
+scripts on Redis (or under a lock with the memory session backend).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from redis.exceptions import RedisError
+
+import session_store
+from redis_keys import request_quota_key, llm_pool_key, llm_client_key, llm_weights_key
+from agent import metrics
+
+LLM_CAPACITY_PER_MINUTE = int(os.getenv("LLM_CAPACITY_PER_MINUTE", "0"))
+LLM_BORROW_THRESHOLD = float(os.getenv("LLM_BORROW_THRESHOLD", "0.8"))
+WINDOW_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ApiClient:
+    name: str
+    requests_per_minute: int = 0
+    llm_calls_per_minute: int = 0
+    weight: float = 1.0
+
+
+def load_clients() -> dict:
+    configured = os.getenv("API_KEYS")
+    if configured:
+        return {
+            key: ApiClient(
+                name=cfg["name"],
+                requests_per_minute=int(cfg.get("requests_per_minute", 0)),
+                llm_calls_per_minute=int(cfg.get("llm_calls_per_minute", 0)),
+                weight=float(cfg.get("weight", 1)),
+            )
+            for key, cfg in json.loads(configured).items()
+        }
+    api_key = os.getenv("API_KEY")
+    return {api_key: ApiClient(name="default")} if api_key else {}
+
+
+CLIENTS = load_clients()
+
+
+def _window() -> int:
+    return int(time.time() // WINDOW_SECONDS)
+
+
+# -----------------------------
+# REDIS
+# -----------------------------
+
+# KEYS: request counter
+# ARGV: limit, ttl
+ADMIT_REQUEST = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then redis.call('EXPIRE', KEYS[1], ARGV[2]) end
+local limit = tonumber(ARGV[1])
+if limit > 0 and count > limit then return 0 end
+return 1
+"""
+
+# KEYS: pool counter, client counter, active-weights hash
+# ARGV: client name, weight, client limit, capacity, borrow threshold, ttl
+ACQUIRE_LLM = """
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[3], ARGV[6])
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local mine = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[3])
+local capacity = tonumber(ARGV[4])
+if limit > 0 and mine >= limit then return 0 end
+if capacity > 0 then
+    if used >= capacity then return 0 end
+    local total = 0
+    for _, w in ipairs(redis.call('HVALS', KEYS[3])) do total = total + tonumber(w) end
+    if total <= 0 then total = tonumber(ARGV[2]) end
+    local share = capacity * tonumber(ARGV[2]) / total
+    if mine >= share and used >= capacity * tonumber(ARGV[5]) then return 0 end
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return 1
+"""
+
+
+class RedisQuotas:
+    def __init__(self, client):
+        self._admit = client.register_script(ADMIT_REQUEST)
+        self._acquire = client.register_script(ACQUIRE_LLM)
+
+    def admit_request(self, client: ApiClient) -> bool:
+        window = _window()
+        return bool(self._admit(
+            keys=[request_quota_key(client.name, window)],
+            args=[client.requests_per_minute, WINDOW_SECONDS * 2],
+        ))
+
+    def acquire_llm(self, client: ApiClient) -> bool:
+        window = _window()
+        return bool(self._acquire(
+            keys=[
+                llm_pool_key(window),
+                llm_client_key(window, client.name),
+                llm_weights_key(window),
+            ],
+            args=[
+                client.name, client.weight, client.llm_calls_per_minute,
+                LLM_CAPACITY_PER_MINUTE, LLM_BORROW_THRESHOLD, WINDOW_SECONDS * 2,
+            ],
+        ))
+
+
+# -----------------------------
+# IN-PROCESS (memory backend)
+# -----------------------------
+
+class LocalQuotas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window = None
+        self._requests = {}
+        self._llm = {}
+        self._weights = {}
+
+    def _roll(self):
+        window = _window()
+        if window != self._window:
+            self._window = window
+            self._requests.clear()
+            self._llm.clear()
+            self._weights.clear()
+
+    def admit_request(self, client: ApiClient) -> bool:
+        with self._lock:
+            self._roll()
+            count = self._requests.get(client.name, 0) + 1
+            self._requests[client.name] = count
+            return not (client.requests_per_minute > 0 and count > client.requests_per_minute)
+
+    def acquire_llm(self, client: ApiClient) -> bool:
+        with self._lock:
+            self._roll()
+            self._weights[client.name] = client.weight
+            used = sum(self._llm.values())
+            mine = self._llm.get(client.name, 0)
+            if client.llm_calls_per_minute > 0 and mine >= client.llm_calls_per_minute:
+                return False
+            if LLM_CAPACITY_PER_MINUTE > 0:
+                if used >= LLM_CAPACITY_PER_MINUTE:
+                    return False
+                total = sum(self._weights.values()) or client.weight
+                share = LLM_CAPACITY_PER_MINUTE * client.weight / total
+                if mine >= share and used >= LLM_CAPACITY_PER_MINUTE * LLM_BORROW_THRESHOLD:
+                    return False
+            self._llm[client.name] = mine + 1
+            return True
+
+
+_quotas = None
+_quotas_lock = threading.Lock()
+
+
+def _get_quotas():
+    global _quotas
+    with _quotas_lock:
+        if _quotas is None:
+            backend = session_store.backend
+            if isinstance(backend, session_store.RedisBackend):
+                _quotas = RedisQuotas(backend.client)
+            else:
+                _quotas = LocalQuotas()
+        return _quotas
+
+
+# -----------------------------
+# PUBLIC API
+# -----------------------------
+
+def authenticate(api_key):
+    """The ApiClient for this key, or None."""
+    if not api_key:
+        return None
+    return CLIENTS.get(api_key)
+
+
+def admit_request(client: ApiClient) -> bool:
+    try:
+        admitted = _get_quotas().admit_request(client)
+    except RedisError as e:
+        logger.error("Request quota check failed, admitting: %s", e)
+        return True
+    if not admitted:
+        metrics.inc("honeypot_requests_rejected_total", client=client.name)
+    return admitted
+
+
+def acquire_llm(client: ApiClient) -> bool:
+    """Take one LLM call from the client's quota and fair share."""
+    try:
+        granted = _get_quotas().acquire_llm(client)
+    except RedisError as e:
+        logger.error("LLM quota check failed, granting: %s", e)
+        return True
+    if not granted:
+        metrics.inc("honeypot_llm_quota_denied_total", client=client.name)
+    return granted
@@ -1,12 +1,29 @@
 import os
 import redis
+from redis.cluster import RedisCluster
 
 REDIS_URL = os.getenv("REDIS_URL")
+# Set to 1 when REDIS_URL points at a Redis Cluster node
+REDIS_CLUSTER = os.getenv("REDIS_CLUSTER", "0") == "1"
 
 if not REDIS_URL:
     raise ValueError("REDIS_URL not set")
 
-redis_client = redis.Redis.from_url(
-    REDIS_URL,
-    decode_responses=True
-)
+
+def _connect(decode_responses: bool):
+    if REDIS_CLUSTER:
+        return RedisCluster.from_url(
+            REDIS_URL,
+            decode_responses=decode_responses
+        )
+    return redis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=decode_responses
+    )
+
+
+redis_client = _connect(decode_responses=True)
+
+# Session blobs may be binary (see session_codec), so they are read
+# and written through a client that leaves responses as bytes
+redis_bytes_client = _connect(decode_responses=False)
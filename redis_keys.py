@@ -0,0 +1,77 @@
+"""
+Redis key names, in one place.
+
+Keys that belong to one session carry the session id as a hash tag
+({...}), so in Redis Cluster they all land on the same slot and
+multi-key scripts over them never hit CROSSSLOT errors:
+
+    session:{<id>}                 session blob
+    session_version:{<id>}         tiered-store version counter
+    turn:{<id>}:<ts>:<hash>        idempotency record
+
+Rate-limit keys are tagged per client (request counters) or per
+one-minute window (LLM fair-share scheduling, which needs the pool,
+client and weight keys together), so they spread across shards over
+time instead of piling onto one node.
+
+Live stats keys are untagged, so per-minute and per-day keys spread
+across shards; they are only touched through non-transactional
+pipelines, which split commands by slot.
+"""
+
+
+def session_key(session_id: str) -> str:
+    return f"session:{{{session_id}}}"
+
+
+def legacy_session_key(session_id: str) -> str:
+    # Untagged name used before cluster support; still read as a fallback
+    return f"session:{session_id}"
+
+
+def session_version_key(session_id: str) -> str:
+    return f"session_version:{{{session_id}}}"
+
+
+def session_id_from_key(key: str) -> str:
+    """Inverse of session_key / legacy_session_key."""
+    session_id = key[len("session:"):]
+    if session_id.startswith("{") and session_id.endswith("}"):
+        session_id = session_id[1:-1]
+    return session_id
+
+
+def turn_key(session_id: str, timestamp, digest: str) -> str:
+    return f"turn:{{{session_id}}}:{timestamp}:{digest}"
+
+
+def request_quota_key(client_name: str, window: int) -> str:
+    return f"quota:{{{client_name}}}:req:{window}"
+
+
+def llm_pool_key(window: int) -> str:
+    return f"quota:{{llm:{window}}}:pool"
+
+
+def llm_client_key(window: int, client_name: str) -> str:
+    return f"quota:{{llm:{window}}}:client:{client_name}"
+
+
+def llm_weights_key(window: int) -> str:
+    return f"quota:{{llm:{window}}}:weights"
+
+
+def stats_active_key() -> str:
+    return "stats:active"
+
+
+def stats_minute_key(minute: int) -> str:
+    return f"stats:min:{minute}"
+
+
+def stats_distinct_key(day: int, field: str) -> str:
+    return f"stats:distinct:{day}:{field}"
+
+
+def stats_scam_types_key(day: int) -> str:
+    return f"stats:scam_types:{day}"
@@ -0,0 +1,156 @@
+"""
+Replay a recorded trace (see tracing.py) through session_store and
+agent_step, with Gemini answered from the recorded outputs and sessions
+kept in memory. Nothing touches the network.
+
+    python replay.py trace.jsonl                 per-stage timings
+    python replay.py trace.jsonl --profile       plus cProfile per stage
+    python replay.py trace.jsonl --profile --top 30 --sort tottime
+"""
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+from contextlib import contextmanager
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+import session_store  # noqa: E402
+import agent.agent as agent_module  # noqa: E402
+from tracing import ReplayModel, load_trace  # noqa: E402
+
+STAGES = ["session_load", "history", "agent_step", "session_save"]
+MAX_MISMATCHES_SHOWN = 10
+
+
+class StageProfiler:
+    def __init__(self, profile: bool):
+        self.timings = {stage: [] for stage in STAGES}
+        self.profiles = {stage: cProfile.Profile() for stage in STAGES} if profile else None
+
+    @contextmanager
+    def stage(self, name):
+        profiler = self.profiles[name] if self.profiles else None
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            self.timings[name].append(time.perf_counter() - started)
+
+
+def replay_request(request: dict, profiler: StageProfiler, model: ReplayModel) -> dict:
+    """
+    Same steps as main._run_turn, minus the callback and archiving.
+    Gemini is only called while recorded outputs are left, standing in for
+    production's quota and load decisions, so a turn that got a template
+    in production does not call the model here.
+    """
+    session_id = request["sessionId"]
+    incoming_text = request["message"]["text"]
+    history = request.get("conversationHistory") or []
+    llm_permit = lambda: bool(model.pending)
+
+    with profiler.stage("session_load"):
+        session = session_store.get_session(session_id)
+
+    with profiler.stage("history"):
+        metadata = request.get("metadata")
+        if metadata:
+            session["channel"] = metadata.get("channel")
+            session["locale"] = metadata.get("locale")
+            session["language"] = metadata.get("language")
+
+        if not session.get("messages") and history:
+            agent_module.rebuild_state_from_history(session, history)
+            session["messages"] = []
+            session["intelligence"] = {}
+            session["agent_state"] = {}
+
+        for msg in history:
+            if msg.get("sender") == "scammer":
+                agent_module.agent_step(session, msg.get("text", ""), llm_permit=llm_permit)
+
+    with profiler.stage("agent_step"):
+        agent_output = agent_module.agent_step(session, incoming_text, llm_permit=llm_permit)
+
+    with profiler.stage("session_save"):
+        session_store.save_session(session_id, session)
+
+    return agent_output
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace")
+    parser.add_argument("--profile", action="store_true", help="cProfile each stage")
+    parser.add_argument("--top", type=int, default=15, help="functions to show per stage")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--seed", type=int, default=0, help="seed for template choice")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    model = ReplayModel()
+    agent_module.model = model
+    profiler = StageProfiler(args.profile)
+
+    requests_replayed = 0
+    replies_matched = 0
+    recorded_seconds = 0.0
+    source_mismatches = []
+    for record in load_trace(args.trace):
+        model.load(record.get("llm", []))
+        agent_output = replay_request(record["request"], profiler, model)
+        requests_replayed += 1
+        recorded_seconds += record.get("seconds", 0.0)
+        if agent_output["reply"] == record.get("reply"):
+            replies_matched += 1
+        # Older traces carry no reply_source
+        recorded_source = record.get("reply_source")
+        if recorded_source and recorded_source != agent_output["reply_source"]:
+            source_mismatches.append((record["request"]["sessionId"], recorded_source, agent_output["reply_source"]))
+
+    if not requests_replayed:
+        print("trace is empty")
+        return
+
+    print(f"requests replayed: {requests_replayed}")
+    print(f"replies identical to recording: {replies_matched}")
+    print(f"reply source differs from recording: {len(source_mismatches)}")
+    for session_id, recorded_source, replayed_source in source_mismatches[:MAX_MISMATCHES_SHOWN]:
+        print(f"  {session_id}: recorded {recorded_source}, replayed {replayed_source}")
+    print(f"recorded wall time: {recorded_seconds:.3f}s")
+    print()
+    print(f"{'stage':<14}{'total ms':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage in STAGES:
+        values = profiler.timings[stage]
+        print(
+            f"{stage:<14}{sum(values) * 1000:>12.2f}"
+            f"{sum(values) / len(values) * 1000:>10.3f}"
+            f"{_percentile(values, 0.5) * 1000:>10.3f}"
+            f"{_percentile(values, 0.95) * 1000:>10.3f}"
+        )
+
+    if profiler.profiles:
+        for stage in STAGES:
+            out = io.StringIO()
+            stats = pstats.Stats(profiler.profiles[stage], stream=out)
+            stats.sort_stats(args.sort).print_stats(args.top)
+            print()
+            print(f"===== {stage} =====")
+            print(out.getvalue())
+
+
+if __name__ == "__main__":
+    main()
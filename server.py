@@ -0,0 +1,64 @@
+"""
+Production launcher: gunicorn master with uvicorn workers.
+
+    python main.py --prod
+
+- WEB_CONCURRENCY workers (default: one per CPU core)
+- the app, compiled patterns, templates and rule tables are imported
+  once in the master and shared copy-on-write with the forked workers
+- on SIGTERM workers stop accepting connections, then wait up to
+  SHUTDOWN_TIMEOUT_SECONDS for in-flight turns (Gemini calls and final
+  result callbacks included) before exiting
+"""
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+SHUTDOWN_TIMEOUT_SECONDS = int(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return int(configured)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def _freeze_shared_objects(server):
+    # Keep the cyclic GC from touching preloaded objects in the workers,
+    # which would copy their pages and undo the sharing
+    gc.collect()
+    gc.freeze()
+
+
+def run(app, port: int) -> None:
+    options = {
+        "bind": f"0.0.0.0:{port}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": SHUTDOWN_TIMEOUT_SECONDS,
+        # A Gemini call plus the callback must fit well inside this
+        "timeout": 120,
+        "keepalive": 5,
+        "when_ready": _freeze_shared_objects,
+    }
+    ProductionServer(app, options).run()
@@ -0,0 +1,267 @@
+"""
+Session serialization.
+
+Sessions are written either as plain JSON text (the original format) or
+as a versioned binary blob:
+
+    0xC1 'S'   magic; 0xC1 never starts JSON text (or a valid UTF-8 string)
+    version    1 = MessagePack body
+    flags      bit 0 set: body is zstd-compressed
+    body
+
+Decoding always accepts every format, so SESSION_ENCODING can be
+switched (or rolled back) while older sessions are still live.
+
+    SESSION_ENCODING=json|msgpack   what new writes use (default json)
+    SESSION_COMPRESSION=none|zstd   compress msgpack bodies
+    SESSION_ZSTD_LEVEL=3
+    SESSION_ZSTD_DICT=a.dict[,b.dict]
+        zstd dictionaries trained on real sessions; the first compresses,
+        all of them decompress (frames carry the dictionary id), so a
+        new dictionary can be rolled in ahead of the old one
+
+msgpack and zstandard are optional until the format that needs them
+is configured.
+
+    python session_codec.py train-dict OUT [--size BYTES] [--samples N] [--archive]
+    python session_codec.py bench [--samples N] [--archive | --transcripts FILE]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+try:
+    import msgpack
+except ImportError:  # only needed once SESSION_ENCODING=msgpack
+    msgpack = None
+try:
+    import zstandard
+except ImportError:  # only needed for SESSION_COMPRESSION=zstd
+    zstandard = None
+
+SESSION_ENCODING = os.getenv("SESSION_ENCODING", "json")
+SESSION_COMPRESSION = os.getenv("SESSION_COMPRESSION", "none")
+SESSION_ZSTD_LEVEL = int(os.getenv("SESSION_ZSTD_LEVEL", "3"))
+SESSION_ZSTD_DICT = os.getenv("SESSION_ZSTD_DICT", "")
+
+MAGIC = b"\xc1S"
+FORMAT_MSGPACK = 1
+FLAG_ZSTD = 0x01
+HEADER_SIZE = len(MAGIC) + 2
+
+# Below this a zstd frame costs more than it saves
+ZSTD_MIN_BYTES = 64
+
+
+def load_dictionaries(spec: str) -> list:
+    dictionaries = []
+    for path in filter(None, (p.strip() for p in spec.split(","))):
+        with open(path, "rb") as f:
+            dictionaries.append(zstandard.ZstdCompressionDict(f.read()))
+    return dictionaries
+
+
+class SessionCodec:
+    def __init__(self, encoding="json", compression="none", level=3, dictionaries=()):
+        if encoding not in ("json", "msgpack"):
+            raise ValueError(f"Unknown SESSION_ENCODING: {encoding}")
+        if compression not in ("none", "zstd"):
+            raise ValueError(f"Unknown SESSION_COMPRESSION: {compression}")
+
+        self.encoding = encoding
+        self.compression = compression
+        self.level = level
+        self.dictionaries = list(dictionaries)
+        self._compressor = None
+        self._decompressors = None
+
+        # Fail at startup rather than on the first write
+        if encoding == "msgpack" and msgpack is None:
+            raise RuntimeError("SESSION_ENCODING=msgpack needs the msgpack package")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("SESSION_COMPRESSION=zstd needs the zstandard package")
+
+        if compression == "zstd" and encoding == "msgpack":
+            if self.dictionaries:
+                self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionaries[0])
+            else:
+                self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def _decompress(self, body: bytes) -> bytes:
+        if self._decompressors is None:
+            self._decompressors = {d.dict_id(): zstandard.ZstdDecompressor(dict_data=d) for d in self.dictionaries}
+            self._decompressors[0] = zstandard.ZstdDecompressor()
+        dict_id = zstandard.get_frame_parameters(body).dict_id
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            raise ValueError(f"Session compressed with unknown zstd dictionary {dict_id}")
+        return decompressor.decompress(body)
+
+    def encode(self, session: dict):
+        """str for JSON, bytes for the binary format."""
+        if self.encoding == "json":
+            return json.dumps(session)
+
+        body = msgpack.packb(session, use_bin_type=True)
+        flags = 0
+        if self._compressor is not None and len(body) >= ZSTD_MIN_BYTES:
+            body = self._compressor.compress(body)
+            flags |= FLAG_ZSTD
+        return MAGIC + bytes((FORMAT_MSGPACK, flags)) + body
+
+    def decode(self, raw) -> dict:
+        if isinstance(raw, str):
+            return json.loads(raw)
+        if not raw.startswith(MAGIC):
+            return json.loads(raw)  # JSON read through a bytes client
+
+        version, flags = raw[2], raw[3]
+        if version != FORMAT_MSGPACK:
+            raise ValueError(f"Unknown session format version {version}")
+        if msgpack is None or (flags & FLAG_ZSTD and zstandard is None):
+            raise RuntimeError("Session needs msgpack/zstandard to decode, which are not installed")
+        body = raw[HEADER_SIZE:]
+        if flags & FLAG_ZSTD:
+            body = self._decompress(body)
+
+        return msgpack.unpackb(body, raw=False)
+
+
+codec = SessionCodec(
+    encoding=SESSION_ENCODING,
+    compression=SESSION_COMPRESSION,
+    level=SESSION_ZSTD_LEVEL,
+    dictionaries=load_dictionaries(SESSION_ZSTD_DICT) if SESSION_ZSTD_DICT else (),
+)
+
+
+def encode_session(session: dict):
+    return codec.encode(session)
+
+
+def decode_session(raw) -> dict:
+    return codec.decode(raw)
+
+
+# -----------------------------
+# DICTIONARY TRAINING / BENCHMARK
+# -----------------------------
+
+def sample_sessions(limit: int, archive: bool = False, transcripts: str = None) -> list:
+    """Real sessions from Redis (default), the archive, or replayed transcripts."""
+    if transcripts:
+        import simulate
+        import agent.agent as agent_module
+        from session_store import new_session
+
+        agent_module.model = simulate.StubModel()
+        sessions = []
+        for texts in simulate.load_transcripts(transcripts)[:limit]:
+            session = new_session()
+            for text in texts:
+                if agent_module.agent_step(session, text)["should_finalize"]:
+                    break
+            sessions.append(session)
+        return sessions
+
+    if archive:
+        from archive import ARCHIVE_DIR, ArchiveReader
+        if not ARCHIVE_DIR:
+            sys.exit("ARCHIVE_DIR is not set")
+        sessions = []
+        for record in ArchiveReader(ARCHIVE_DIR).scan():
+            sessions.append(record["session"])
+            if len(sessions) >= limit:
+                break
+        return sessions
+
+    from redis_client import redis_client, redis_bytes_client
+    sessions = []
+    for key in redis_client.scan_iter(match="session:*", count=500):
+        raw = redis_bytes_client.get(key)
+        if raw:
+            sessions.append(decode_session(raw))
+            if len(sessions) >= limit:
+                break
+    return sessions
+
+
+def train_dictionary(sessions: list, size: int):
+    samples = [msgpack.packb(s, use_bin_type=True) for s in sessions]
+    return zstandard.train_dictionary(size, samples)
+
+
+def _measure(variant: SessionCodec, sessions: list) -> dict:
+    encoded, encode_times, decode_times = [], [], []
+    for session in sessions:
+        start = time.perf_counter()
+        raw = variant.encode(session)
+        encode_times.append(time.perf_counter() - start)
+        encoded.append(raw.encode("utf-8") if isinstance(raw, str) else raw)
+
+    for raw in encoded:
+        start = time.perf_counter()
+        variant.decode(raw)
+        decode_times.append(time.perf_counter() - start)
+
+    return {
+        "bytes_mean": round(statistics.mean(len(raw) for raw in encoded)),
+        "bytes_p50": round(statistics.median(len(raw) for raw in encoded)),
+        "encode_us": round(statistics.mean(encode_times) * 1e6, 1),
+        "decode_us": round(statistics.mean(decode_times) * 1e6, 1),
+    }
+
+
+def benchmark(sessions: list, dict_size: int) -> dict:
+    """
+    Compare encodings. The dictionary is trained on one half of the
+    sessions and every variant is measured on the other half, so the
+    dictionary never sees the payloads it is scored on.
+    """
+    train, test = sessions[::2], sessions[1::2]
+    variants = {
+        "json": SessionCodec("json"),
+        "msgpack": SessionCodec("msgpack"),
+        "msgpack+zstd": SessionCodec("msgpack", "zstd", SESSION_ZSTD_LEVEL),
+    }
+    try:
+        dictionary = train_dictionary(train, dict_size)
+        variants["msgpack+zstd+dict"] = SessionCodec("msgpack", "zstd", SESSION_ZSTD_LEVEL, [dictionary])
+    except Exception as e:  # zstd refuses to train on too few or too similar samples
+        print(f"skipping dictionary variant: {e}", file=sys.stderr)
+
+    report = {name: _measure(variant, test) for name, variant in variants.items()}
+    baseline = report["json"]["bytes_mean"]
+    for result in report.values():
+        result["size_vs_json"] = round(result["bytes_mean"] / baseline, 3)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train-dict", "bench"])
+    parser.add_argument("out", nargs="?", help="dictionary file to write (train-dict)")
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=16 * 1024, help="dictionary size in bytes")
+    parser.add_argument("--archive", action="store_true", help="sample sessions from ARCHIVE_DIR")
+    parser.add_argument("--transcripts", help="build sessions by replaying transcripts offline (bench)")
+    args = parser.parse_args()
+
+    sessions = sample_sessions(args.samples, archive=args.archive, transcripts=args.transcripts)
+    if len(sessions) < 2:
+        sys.exit(f"need at least 2 sessions, found {len(sessions)}")
+
+    if args.command == "train-dict":
+        if not args.out:
+            sys.exit("usage: python session_codec.py train-dict OUT")
+        dictionary = train_dictionary(sessions, args.size)
+        with open(args.out, "wb") as f:
+            f.write(dictionary.as_bytes())
+        print(f"trained {len(dictionary.as_bytes())}-byte dictionary {dictionary.dict_id()} on {len(sessions)} sessions")
+    else:
+        print(f"{len(sessions) // 2} sessions measured")
+        print(json.dumps(benchmark(sessions, args.size), indent=2))
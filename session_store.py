@@ -1,32 +1,43 @@
-import json
 import logging
+import os
+from abc import ABC, abstractmethod
+import threading
 import time
+from collections import OrderedDict
 from redis.exceptions import RedisError
-from redis_client import redis_client
 
-SESSION_TTL_SECONDS = 3600  
+from redis_keys import session_key, legacy_session_key, session_version_key
+from session_codec import encode_session, decode_session
+
+SESSION_TTL_SECONDS = 3600
+
+# redis  - every read and write goes to Redis (default)
+# memory - process-local dict, for tests and benchmarks (no Redis needed)
+# tiered - bounded in-process LRU in front of Redis
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "redis")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+# How long a cached session is served without checking its version in
+# Redis. Only raise it when every session is routed to one worker
+# (sticky); with several workers a stale copy means a conflict and a redo.
+SESSION_CACHE_REVALIDATE_SECONDS = float(os.getenv("SESSION_CACHE_REVALIDATE_SECONDS", "0"))
+# Until this epoch time, a missing session is also looked up under its
+# pre-cluster untagged key. Set it to the rollout time plus
+# SESSION_TTL_SECONDS; after that no legacy session can still exist.
+SESSION_LEGACY_KEYS_UNTIL = float(os.getenv("SESSION_LEGACY_KEYS_UNTIL", "0"))
 
 logger = logging.getLogger(__name__)
 
 
+class SessionConflict(Exception):
+    """The session changed in the store since it was loaded; the write was refused."""
 
-def get_session(session_id: str) -> dict:
-    key = f"session:{session_id}"
 
-    try:
-        raw = redis_client.get(key)
-    except RedisError as e:
-        logger.error("Redis GET failed: %s", e)
-        raw = None 
+def _read_legacy_keys() -> bool:
+    return time.time() < SESSION_LEGACY_KEYS_UNTIL
 
-    if raw:
-        session = json.loads(raw)
-        if "started_at" not in session:
-            session["started_at"] = time.time()
-        return session
 
-    
-    session = {
+def new_session() -> dict:
+    return {
         "messages": [],
         "agent_state": {
             "turns": 0,
@@ -52,12 +63,252 @@ def get_session(session_id: str) -> dict:
         "started_at": time.time()
     }
 
+
+# -----------------------------
+# BACKENDS
+# -----------------------------
+
+class SessionBackend(ABC):
+    """
+    Stores serialized sessions (str or bytes, see session_codec) by id.
+    `load` returns None when missing.
+
+    The *_value methods hold small auxiliary records with their own TTL
+    (e.g. idempotency records) in the same store as the sessions.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def store(self, session_id: str, raw) -> None:
+        ...
+
+    @abstractmethod
+    def get_value(self, key: str):
+        ...
+
+    @abstractmethod
+    def set_value(self, key: str, value: str, ttl: int, only_if_missing: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_value(self, key: str) -> None:
+        ...
+
+
+class RedisBackend(SessionBackend):
+    """
+    `client` decodes responses to str and serves the auxiliary values;
+    session blobs go through `blob_client`, which returns raw bytes.
+    """
+
+    def __init__(self, client=None, blob_client=None):
+        if client is None:
+            from redis_client import redis_client as client, redis_bytes_client as blob_client
+        self.client = client
+        self.blob_client = blob_client or client
+
+    def load(self, session_id):
+        raw = self.blob_client.get(session_key(session_id))
+        if raw is None and _read_legacy_keys():
+            # Sessions written before keys were hash-tagged
+            raw = self.blob_client.get(legacy_session_key(session_id))
+        return raw
+
+    def store(self, session_id, raw):
+        self.blob_client.setex(session_key(session_id), SESSION_TTL_SECONDS, raw)
+
+    def get_value(self, key):
+        return self.client.get(key)
+
+    def set_value(self, key, value, ttl, only_if_missing=False):
+        return bool(self.client.set(key, value, ex=ttl, nx=only_if_missing))
+
+    def delete_value(self, key):
+        self.client.delete(key)
+
+
+class MemoryBackend(SessionBackend):
+    def __init__(self):
+        self._data = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _live(table, key):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del table[key]
+            return None
+        return value
+
+    def load(self, session_id):
+        with self._lock:
+            return self._live(self._data, session_id)
+
+    def store(self, session_id, raw):
+        with self._lock:
+            self._data[session_id] = (time.time() + SESSION_TTL_SECONDS, raw)
+
+    def get_value(self, key):
+        with self._lock:
+            return self._live(self._values, key)
+
+    def set_value(self, key, value, ttl, only_if_missing=False):
+        with self._lock:
+            if only_if_missing and self._live(self._values, key) is not None:
+                return False
+            self._values[key] = (time.time() + ttl, value)
+            return True
+
+    def delete_value(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+
+# Write the blob and bump its version atomically, unless ARGV[3] names
+# an expected version that is no longer current. Returns the version that
+# was current before the call; the write happened if it matches.
+STORE_VERSIONED = """
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+if ARGV[3] ~= '' and prev ~= tonumber(ARGV[3]) then
+    return prev
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SETEX', KEYS[2], ARGV[2], prev + 1)
+return prev
+"""
+
+
+class TieredBackend(RedisBackend):
+    """
+    Bounded LRU of serialized sessions in front of Redis, write-through.
+
+    Every write bumps a version counter stored next to the session in
+    Redis. A read of a cached entry first confirms with one cheap version
+    GET that it is still current (or skips that for
+    SESSION_CACHE_REVALIDATE_SECONDS, sticky deployments only). A write
+    only goes through if the version is still the one that was loaded;
+    otherwise the local entry is dropped and SessionConflict is raised,
+    so the caller can reload and redo the turn.
+    """
+
+    def __init__(self, client=None, blob_client=None, max_sessions=SESSION_CACHE_SIZE,
+                 revalidate_seconds=SESSION_CACHE_REVALIDATE_SECONDS):
+        super().__init__(client, blob_client)
+        self.max_sessions = max_sessions
+        self.revalidate_seconds = revalidate_seconds
+        self._cache = OrderedDict()  # session_id -> [version, raw, checked_at]
+        self._lock = threading.Lock()
+        self._store_versioned = self.blob_client.register_script(STORE_VERSIONED)
+
+    @staticmethod
+    def _keys(session_id):
+        return [session_key(session_id), session_version_key(session_id)]
+
+    def _remember(self, session_id, version, raw):
+        with self._lock:
+            self._cache[session_id] = [version, raw, time.monotonic()]
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_sessions:
+                self._cache.popitem(last=False)
+
+    def _evict(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+                entry = list(entry)
+
+        if entry is not None:
+            version, raw, checked_at = entry
+            if time.monotonic() - checked_at < self.revalidate_seconds:
+                return raw
+            try:
+                current = int(self.client.get(self._keys(session_id)[1]) or 0)
+            except RedisError as e:
+                logger.error("Redis version check failed, serving cached session: %s", e)
+                return raw
+            if current == version:
+                self._remember(session_id, version, raw)
+                return raw
+            self._evict(session_id)
+
+        raw, version = self.blob_client.mget(self._keys(session_id))
+        if raw is None:
+            if _read_legacy_keys():
+                # Sessions written before keys were hash-tagged
+                return self.blob_client.get(legacy_session_key(session_id))
+            return None
+        self._remember(session_id, int(version or 0), raw)
+        return raw
+
+    def store(self, session_id, raw):
+        with self._lock:
+            entry = self._cache.get(session_id)
+            expected = entry[0] if entry is not None else None
+
+        prev = int(self._store_versioned(
+            keys=self._keys(session_id),
+            args=[raw, SESSION_TTL_SECONDS, "" if expected is None else expected],
+        ))
+
+        if expected is not None and prev != expected:
+            # Someone else wrote this session since we loaded it
+            self._evict(session_id)
+            raise SessionConflict(session_id)
+
+        self._remember(session_id, prev + 1, raw)
+
+
+def make_backend(name: str) -> SessionBackend:
+    if name == "redis":
+        return RedisBackend()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "tiered":
+        return TieredBackend()
+    raise ValueError(f"Unknown SESSION_BACKEND: {name}")
+
+
+backend = make_backend(SESSION_BACKEND)
+
+
+def set_backend(new_backend: SessionBackend) -> None:
+    global backend
+    backend = new_backend
+
+
+# -----------------------------
+# PUBLIC API
+# -----------------------------
+
+def get_session(session_id: str) -> dict:
     try:
-        redis_client.setex(
-            key,
-            SESSION_TTL_SECONDS,
-            json.dumps(session)
-        )
+        raw = backend.load(session_id)
+    except RedisError as e:
+        logger.error("Redis GET failed: %s", e)
+        raw = None
+
+    if raw:
+        session = decode_session(raw)
+        if "started_at" not in session:
+            session["started_at"] = time.time()
+        return session
+
+    session = new_session()
+
+    try:
+        backend.store(session_id, encode_session(session))
     except RedisError as e:
         logger.error("Redis SET failed: %s", e)
 
@@ -66,13 +317,8 @@ def get_session(session_id: str) -> dict:
 
 
 def save_session(session_id: str, session: dict) -> None:
-    key = f"session:{session_id}"
-
+    """Raises SessionConflict if the session changed since `get_session`."""
     try:
-        redis_client.setex(
-            key,
-            SESSION_TTL_SECONDS,
-            json.dumps(session)
-        )
+        backend.store(session_id, encode_session(session))
     except RedisError as e:
         logger.error("Redis SET failed: %s", e)
@@ -0,0 +1,228 @@
+"""
+Offline policy simulator.
+
+Replays recorded scammer transcripts through agent_step with Gemini
+stubbed out and sessions held in plain dicts, once per policy variant,
+in parallel across cores. Reports per policy:
+
+- LLM calls per session
+- turns until the session finalizes (and how many never do)
+- intelligence items captured
+
+    python simulate.py transcripts.jsonl
+    python simulate.py trace.jsonl --policies my_policies:VARIANTS --workers 8
+
+Transcripts are JSON lines, either {"sessionId": ..., "messages": [...]}
+where messages are strings or {"sender", "text"} dicts, or records of a
+TRACE_FILE capture (grouped by sessionId). Replay is open-loop: the
+scammer's recorded messages do not react to the simulated replies.
+
+A policy variant is a dict that overrides any of choose_strategy,
+should_use_llm, should_terminate and reflect; `--policies module:NAME`
+loads a {variant_name: overrides} dict to compare against the built-ins.
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import statistics
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+import agent.agent as agent_module  # noqa: E402
+from session_store import new_session  # noqa: E402
+
+POLICY_FUNCTIONS = ("choose_strategy", "should_use_llm", "should_terminate", "reflect")
+
+INTEL_FIELDS = (
+    "upiIds", "phoneNumbers", "phishingLinks", "bankAccounts",
+    "emailAddresses", "caseIds", "policyNumbers", "orderNumbers",
+)
+
+BUILTIN_POLICIES = {
+    "baseline": {},
+    "template_only": {"should_use_llm": lambda strategy, agent_state, session: False},
+}
+
+_BASELINE = {name: getattr(agent_module, name) for name in POLICY_FUNCTIONS}
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Answers like Gemini would, instantly. Replies carry a counter, so
+    the retrieval tier never indexes them and every gated call is counted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return _StubResponse(json.dumps({"language": "english", "reply": f"stub reply {self.calls}"}))
+
+
+def _accepting_analysis(choose_strategy):
+    """
+    agent_step passes choose_strategy the turn's `analysis`; overrides
+    written against the original (session, incoming_text, reflection=None)
+    signature get wrapped to drop it.
+    """
+    params = inspect.signature(choose_strategy).parameters.values()
+    if any(p.name == "analysis" or p.kind is p.VAR_KEYWORD for p in params):
+        return choose_strategy
+
+    def adapted(session, incoming_text, reflection=None, analysis=None):
+        return choose_strategy(session, incoming_text, reflection=reflection)
+    return adapted
+
+
+def load_policies(spec):
+    policies = OrderedDict(BUILTIN_POLICIES)
+    if spec:
+        module_name, _, attr = spec.partition(":")
+        policies.update(getattr(importlib.import_module(module_name), attr or "VARIANTS"))
+    return policies
+
+
+def load_transcripts(path):
+    transcripts = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "request" in record:
+                request = record["request"]
+                transcripts.setdefault(request["sessionId"], []).append(request["message"]["text"])
+            else:
+                texts = [
+                    m if isinstance(m, str) else m.get("text", "")
+                    for m in record.get("messages", [])
+                    if isinstance(m, str) or m.get("sender", "scammer") == "scammer"
+                ]
+                transcripts[record.get("sessionId", f"transcript-{n}")] = texts
+    return list(transcripts.values())
+
+
+# -----------------------------
+# WORKER
+# -----------------------------
+
+_policies = None
+
+
+def _init_worker(policy_spec):
+    global _policies
+    _policies = load_policies(policy_spec)
+    agent_module.model = StubModel()
+
+
+def _run_session(texts):
+    session = new_session()
+    finalized_at = None
+
+    for text in texts:
+        output = agent_module.agent_step(session, text)
+        if output["should_finalize"]:
+            finalized_at = session["agent_state"]["turns"]
+            break
+
+    intelligence = session["intelligence"]
+    return {
+        "llm_calls": session["agent_state"]["llm_calls"],
+        "turns": session["agent_state"]["turns"],
+        "finalized_at": finalized_at,
+        "intel": sum(len(intelligence.get(k, [])) for k in INTEL_FIELDS),
+        "scam_detected": session.get("scam_detected", False),
+    }
+
+
+def _run_batch(args):
+    policy_name, batch = args
+    overrides = _policies[policy_name]
+    for name in POLICY_FUNCTIONS:
+        function = overrides.get(name, _BASELINE[name])
+        if name == "choose_strategy":
+            function = _accepting_analysis(function)
+        setattr(agent_module, name, function)
+    return policy_name, [_run_session(texts) for texts in batch]
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+
+def summarize(results):
+    finalized = [r["finalized_at"] for r in results if r["finalized_at"] is not None]
+    llm_calls = [r["llm_calls"] for r in results]
+    intel = [r["intel"] for r in results]
+    return {
+        "sessions": len(results),
+        "llm_calls_mean": statistics.mean(llm_calls),
+        "llm_calls_total": sum(llm_calls),
+        "finalized": len(finalized),
+        "turns_to_finalize_mean": statistics.mean(finalized) if finalized else None,
+        "intel_mean": statistics.mean(intel),
+        "intel_per_llm_call": sum(intel) / sum(llm_calls) if sum(llm_calls) else None,
+    }
+
+
+def _fmt(value, width):
+    if value is None:
+        return f"{'-':>{width}}"
+    if isinstance(value, float):
+        return f"{value:>{width}.2f}"
+    return f"{value:>{width}}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcripts")
+    parser.add_argument("--policies", help="module:NAME of extra policy variants")
+    parser.add_argument("--only", nargs="*", help="run only these policy variants")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.transcripts)
+    policy_names = args.only or list(load_policies(args.policies))
+    batches = [
+        transcripts[i:i + args.batch_size]
+        for i in range(0, len(transcripts), args.batch_size)
+    ]
+    tasks = [(name, batch) for name in policy_names for batch in batches]
+
+    results = {name: [] for name in policy_names}
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.policies,),
+    ) as pool:
+        for name, batch_results in pool.map(_run_batch, tasks):
+            results[name].extend(batch_results)
+
+    summary = {name: summarize(results[name]) for name in policy_names if results[name]}
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    columns = [
+        ("sessions", 9), ("llm_calls_mean", 15), ("finalized", 10),
+        ("turns_to_finalize_mean", 23), ("intel_mean", 11), ("intel_per_llm_call", 19),
+    ]
+    print(f"{'policy':<16}" + "".join(f"{c:>{w}}" for c, w in columns))
+    for name, row in summary.items():
+        print(f"{name:<16}" + "".join(_fmt(row[c], w) for c, w in columns))
+
+
+if __name__ == "__main__":
+    main()
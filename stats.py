@@ -0,0 +1,229 @@
+"""
+Live operational stats, maintained incrementally on every turn.
+
+Nothing here scans sessions; each turn updates a few small aggregates
+and reading them costs the same whatever the session count:
+
+    active sessions   sorted set of sessionId -> last turn time
+    last hour         one hash per minute: turns, finalized, replies by source
+    today             HyperLogLog of distinct indicators per field,
+                      hash of finalized sessions by scam type
+
+Updates and reads go through non-transactional pipelines, which Redis
+Cluster clients split by slot, so the keys need no shared hash tag and
+spread across shards. With the memory session backend the same numbers
+are kept in-process.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from redis.exceptions import RedisError
+
+import events
+import session_store
+from agent.extraction import intel_key
+from redis_keys import stats_active_key, stats_minute_key, stats_distinct_key, stats_scam_types_key
+
+STATS_ACTIVE_SECONDS = int(os.getenv("STATS_ACTIVE_SECONDS", "300"))
+HOUR_MINUTES = 60
+DAY_SECONDS = 86400
+
+DISTINCT_FIELDS = ("upiIds", "phoneNumbers", "phishingLinks", "bankAccounts", "emailAddresses")
+REPLY_SOURCES = ("llm", "retrieval", "template")
+
+logger = logging.getLogger(__name__)
+
+
+def _minute(now: float) -> int:
+    return int(now // 60)
+
+
+def _day(now: float) -> int:
+    return int(now // DAY_SECONDS)
+
+
+def _summary(active, live, minutes, distinct, scam_types, now) -> dict:
+    """Shape the raw aggregates into the /api/stats response."""
+    hour = Counter()
+    for counts in minutes:
+        hour.update({field: int(value) for field, value in counts.items()})
+
+    replies = {source: hour[f"reply_{source}"] for source in REPLY_SOURCES}
+    total_replies = sum(replies.values())
+    return {
+        "activeSessions": active,
+        "liveSessions": live,
+        "lastHour": {
+            "turns": hour["turns"],
+            "finalized": hour["finalized"],
+            "replies": replies,
+            "llmReplyRatio": round(replies["llm"] / total_replies, 3) if total_replies else 0.0,
+        },
+        "today": {
+            "distinctIndicators": distinct,
+            "scamTypes": {k: int(v) for k, v in scam_types.items()},
+        },
+        "generatedAt": int(now),
+    }
+
+
+# -----------------------------
+# REDIS
+# -----------------------------
+
+class RedisStats:
+    def __init__(self, client):
+        self.client = client
+
+    def record_turn(self, session_id, new, reply_source, now):
+        minute_key = stats_minute_key(_minute(now))
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(stats_active_key(), {session_id: now})
+        pipe.zremrangebyscore(stats_active_key(), "-inf", now - session_store.SESSION_TTL_SECONDS)
+        pipe.hincrby(minute_key, "turns", 1)
+        pipe.hincrby(minute_key, f"reply_{reply_source}", 1)
+        pipe.expire(minute_key, HOUR_MINUTES * 60 * 2)
+        for field in DISTINCT_FIELDS:
+            if new.get(field):
+                key = stats_distinct_key(_day(now), field)
+                pipe.pfadd(key, *new[field])
+                pipe.expire(key, DAY_SECONDS * 2)
+        pipe.execute()
+
+    def record_finalized(self, scam_type, now):
+        minute_key = stats_minute_key(_minute(now))
+        types_key = stats_scam_types_key(_day(now))
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(minute_key, "finalized", 1)
+        pipe.expire(minute_key, HOUR_MINUTES * 60 * 2)
+        pipe.hincrby(types_key, scam_type, 1)
+        pipe.expire(types_key, DAY_SECONDS * 2)
+        pipe.execute()
+
+    def read(self, now):
+        minute = _minute(now)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcount(stats_active_key(), now - STATS_ACTIVE_SECONDS, "+inf")
+        pipe.zcount(stats_active_key(), now - session_store.SESSION_TTL_SECONDS, "+inf")
+        for m in range(minute - HOUR_MINUTES + 1, minute + 1):
+            pipe.hgetall(stats_minute_key(m))
+        for field in DISTINCT_FIELDS:
+            pipe.pfcount(stats_distinct_key(_day(now), field))
+        pipe.hgetall(stats_scam_types_key(_day(now)))
+        results = pipe.execute()
+
+        active, live = results[0], results[1]
+        minutes = results[2:2 + HOUR_MINUTES]
+        distinct = dict(zip(DISTINCT_FIELDS, results[2 + HOUR_MINUTES:-1]))
+        return _summary(active, live, minutes, distinct, results[-1], now)
+
+
+# -----------------------------
+# IN-PROCESS (memory backend)
+# -----------------------------
+
+class LocalStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}    # session_id -> last turn time
+        self._minutes = {}   # minute -> Counter
+        self._day = None
+        self._distinct = {field: set() for field in DISTINCT_FIELDS}
+        self._scam_types = Counter()
+
+    def _roll(self, now):
+        day = _day(now)
+        if day != self._day:
+            self._day = day
+            for values in self._distinct.values():
+                values.clear()
+            self._scam_types.clear()
+        oldest = _minute(now) - HOUR_MINUTES
+        for minute in [m for m in self._minutes if m <= oldest]:
+            del self._minutes[minute]
+
+    def _bucket(self, now):
+        return self._minutes.setdefault(_minute(now), Counter())
+
+    def record_turn(self, session_id, new, reply_source, now):
+        with self._lock:
+            self._roll(now)
+            self._active[session_id] = now
+            bucket = self._bucket(now)
+            bucket["turns"] += 1
+            bucket[f"reply_{reply_source}"] += 1
+            for field in DISTINCT_FIELDS:
+                self._distinct[field].update(new.get(field, ()))
+
+    def record_finalized(self, scam_type, now):
+        with self._lock:
+            self._roll(now)
+            self._bucket(now)["finalized"] += 1
+            self._scam_types[scam_type] += 1
+
+    def read(self, now):
+        with self._lock:
+            self._roll(now)
+            expired = now - session_store.SESSION_TTL_SECONDS
+            for session_id in [s for s, t in self._active.items() if t < expired]:
+                del self._active[session_id]
+            active = sum(1 for t in self._active.values() if t >= now - STATS_ACTIVE_SECONDS)
+            return _summary(
+                active,
+                len(self._active),
+                [dict(counts) for counts in self._minutes.values()],
+                {field: len(values) for field, values in self._distinct.items()},
+                dict(self._scam_types),
+                now,
+            )
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def _get_stats():
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            backend = session_store.backend
+            if isinstance(backend, session_store.RedisBackend):
+                _stats = RedisStats(backend.client)
+            else:
+                _stats = LocalStats()
+        return _stats
+
+
+# -----------------------------
+# PUBLIC API
+# -----------------------------
+
+def record_turn(session_id: str, before: dict, session: dict, agent_output: dict) -> None:
+    """Count one answered turn; `before` is the events.snapshot taken at load."""
+    # Distinct counts go by canonical form, not by spelling
+    new = {
+        field: [intel_key(field, value) for value in values]
+        for field, values in events.new_intel(before, session).items()
+    }
+    try:
+        _get_stats().record_turn(
+            session_id,
+            new,
+            agent_output.get("reply_source", "template"),
+            time.time(),
+        )
+    except RedisError as e:
+        logger.error("Stats update failed: %s", e)
+
+
+def record_finalized(scam_type: str) -> None:
+    try:
+        _get_stats().record_finalized(scam_type, time.time())
+    except RedisError as e:
+        logger.error("Stats update failed: %s", e)
+
+
+def read_stats() -> dict:
+    return _get_stats().read(time.time())
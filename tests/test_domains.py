@@ -0,0 +1,56 @@
+from agent.domains import classify_address, normalize_link, strip_trailing_punctuation
+from agent.extraction import extract_intelligence
+
+
+def test_dotless_domain_is_upi():
+    assert classify_address("Fraud.Guy@YBL") == ("upi", "Fraud.Guy@YBL")
+    assert classify_address("scammer.fraud@fakebank") == ("upi", "scammer.fraud@fakebank")
+
+
+def test_known_suffix_is_email():
+    assert classify_address("support@fakebank.com") == ("email", "support@fakebank.com")
+    assert classify_address("a.b@fakebank.co.in") == ("email", "a.b@fakebank.co.in")
+
+
+def test_psp_handle_with_glued_word_is_upi():
+    assert classify_address("abc@ybl.Thanks") == ("upi", "abc@ybl")
+
+
+def test_trailing_punctuation_is_not_part_of_address():
+    assert classify_address("support@fakebank.com.") == ("email", "support@fakebank.com")
+
+
+def test_too_short_is_rejected():
+    assert classify_address("x@oksbi") is None
+    assert classify_address("bad@12") is None
+
+
+def test_link_host_is_canonicalized():
+    assert normalize_link("HTTPS://WWW.Sbi-Verify.XYZ:443/login/") == "https://sbi-verify.xyz/login"
+    assert normalize_link("https://bit.ly/abc#frag") == "https://bit.ly/abc"
+
+
+def test_tracking_params_dropped_without_reencoding():
+    url = "https://evil.com/p?utm_source=wa&r=a/b%20c&sig=AB=="
+    assert normalize_link(url) == "https://evil.com/p?r=a/b%20c&sig=AB=="
+    assert normalize_link("https://evil.com/pay?to=scam@ybl&fbclid=x") == "https://evil.com/pay?to=scam@ybl"
+
+
+def test_query_untouched_without_tracking_params():
+    assert normalize_link("https://evil.com/p?b=2&a=%2F") == "https://evil.com/p?b=2&a=%2F"
+
+
+def test_balanced_brackets_are_kept():
+    assert strip_trailing_punctuation("https://evil.com/(secure)") == "https://evil.com/(secure)"
+    assert normalize_link("https://evil.com/(secure)") == "https://evil.com/(secure)"
+    assert strip_trailing_punctuation("https://evil.com/a).") == "https://evil.com/a"
+
+
+def test_extraction_keeps_raw_values_and_dedups_canonically():
+    intel = extract_intelligence(
+        "Open https://WWW.Evil.com/Login?utm_source=sms, or https://evil.com/Login "
+        "and pay Fraud@YBL or fraud@ybl. Mail support@fakebank.com"
+    )
+    assert intel["phishingLinks"] == ["https://WWW.Evil.com/Login?utm_source=sms"]
+    assert intel["upiIds"] == ["Fraud@YBL"]
+    assert intel["emailAddresses"] == ["support@fakebank.com"]
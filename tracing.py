@@ -0,0 +1,160 @@
+"""
+Opt-in capture of production traffic for offline replay.
+
+With TRACE_FILE set, every /api/honeypot and /api/honeypot/stream turn
+that runs the agent is appended to that file as one compact JSON line:
+
+    {"ts": ..., "request": {...}, "llm": [{"text": ..., "seconds": ...}],
+     "seconds": ..., "reply": ..., "reply_source": "llm|retrieval|template"}
+
+`llm` holds the raw Gemini outputs of the turn in call order (or
+{"error": ...} for failed calls), which is what replay.py feeds back
+instead of calling Gemini. Whether Gemini was called at all (quota,
+load mode) is not recorded as such; replay calls it exactly as often as
+production did and checks `reply_source` against the recording.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+logger = logging.getLogger(__name__)
+
+_llm_calls = contextvars.ContextVar("trace_llm_calls", default=None)
+
+
+class RecordingModel:
+    """Wraps the Gemini model and notes each output in the current trace."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def generate_content(self, *args, **kwargs):
+        calls = _llm_calls.get()
+        started = time.perf_counter()
+        if kwargs.get("stream"):
+            return self._record_stream(calls, started, *args, **kwargs)
+        try:
+            resp = self._model.generate_content(*args, **kwargs)
+            text = resp.text
+        except Exception as e:
+            if calls is not None:
+                calls.append({"error": str(e), "seconds": time.perf_counter() - started})
+            raise
+        if calls is not None:
+            calls.append({"text": text, "seconds": time.perf_counter() - started})
+        return resp
+
+    def _record_stream(self, calls, started, *args, **kwargs):
+        chunks = []
+        try:
+            for chunk in self._model.generate_content(*args, **kwargs):
+                chunks.append(chunk.text)
+                yield chunk
+        except Exception as e:
+            if calls is not None:
+                calls.append({"error": str(e), "seconds": time.perf_counter() - started})
+            raise
+        if calls is not None:
+            calls.append({"text": "".join(chunks), "seconds": time.perf_counter() - started})
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class ReplayModel:
+    """Stands in for Gemini, answering from recorded outputs."""
+
+    def __init__(self):
+        self.pending = []
+
+    def load(self, llm_calls):
+        self.pending = list(llm_calls)
+
+    def generate_content(self, *args, **kwargs):
+        if not self.pending:
+            raise RuntimeError("No recorded LLM output for this call")
+        call = self.pending.pop(0)
+        if "error" in call:
+            raise RuntimeError(call["error"])
+        if kwargs.get("stream"):
+            return [_Response(call["text"])]
+        return _Response(call["text"])
+
+
+class TraceRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_recorder = TraceRecorder(TRACE_FILE) if TRACE_FILE else None
+
+
+def install() -> None:
+    """Wrap the agent's Gemini model for recording. No-op unless TRACE_FILE is set."""
+    if _recorder is None:
+        return
+    import agent.agent as agent_module
+    if not isinstance(agent_module.model, RecordingModel):
+        agent_module.model = RecordingModel(agent_module.model)
+
+
+@contextmanager
+def trace_request(request: dict):
+    """Record one request; the caller may put the reply into the yielded dict."""
+    if _recorder is None:
+        yield {}
+        return
+
+    record = {"ts": time.time(), "request": request, "llm": []}
+    token = _llm_calls.set(record["llm"])
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        try:
+            _llm_calls.reset(token)
+        except ValueError:
+            pass  # closed from another context (a streamed response body)
+        try:
+            _recorder.write(record)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error("Trace write failed: %s", e)
+
+
+def resume(record: dict) -> None:
+    """
+    Point Gemini recording at `record` from the current context.
+
+    Streaming response bodies run each step in a fresh copy of the
+    request's context, so a trace opened by the endpoint is not visible
+    there; call this in the step that makes the Gemini call.
+    """
+    if "llm" in record:
+        _llm_calls.set(record["llm"])
+
+
+def load_trace(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)